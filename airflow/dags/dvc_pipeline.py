@@ -8,6 +8,8 @@ with DAG(
     schedule_interval=None,  # Ручной запуск
     # schedule_interval="@daily", # @weekly
     catchup=False,
+    # One retraining at a time: further runs wait in the queue
+    max_active_runs=1,
 ) as dag:
 
     import_data = BashOperator(
@@ -1,22 +1,62 @@
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException
 from jose import jwt, JWTError
+from functools import lru_cache
+import time
 import os
 
+from src.utils.lru import LRUCache
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+
+@lru_cache(maxsize=1)
+def jwt_settings():
+    """(secret key, algorithm), read from the environment once.
+
+    Read on first use rather than at import, so that a .env loaded by the
+    app is seen. After changing them, call jwt_settings.cache_clear() and
+    token_cache().clear().
+    """
+    return os.getenv("SECRET_KEY"), os.getenv("ALGORITHM", "HS256")
+
+
+class TokenCache(LRUCache):
+    """Thread-safe LRU of verified token payloads, each dropped at its exp claim"""
+
+    def __init__(self, max_size: int = 1024):
+        super().__init__(max_size, clock=time.time)
+
+    def put(self, token: str, payload: dict):
+        # Without exp a token never expires: keep verifying it every time
+        expires_at = payload.get("exp")
+        if isinstance(expires_at, (int, float)):
+            super().put(token, payload, expires_at=expires_at)
+
+
+@lru_cache(maxsize=1)
+def token_cache() -> TokenCache:
+    """Verified tokens kept in memory until their exp, created on first use
+    (like jwt_settings) with AUTH_TOKEN_CACHE_SIZE entries; 0 = decode every request"""
+    return TokenCache(int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024")))
+
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=[os.getenv("ALGORITHM")])
-        return payload  # { "sub": "admin", "role": "admin" }
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
+    cache = token_cache()
+    payload = cache.get(token)
+    if payload is None:
+        secret_key, algorithm = jwt_settings()
+        try:
+            payload = jwt.decode(token, secret_key, algorithms=[algorithm])
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        cache.put(token, payload)
+    return dict(payload)  # { "sub": "admin", "role": "admin" }
+
 
 def get_admin_user(token: str = Depends(oauth2_scheme)):
     user = get_current_user(token)
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Only for Admin!")
-    return user
\ No newline at end of file
+    return user
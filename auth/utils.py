@@ -3,6 +3,7 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 import os
 from src.database.database import get_db
+from auth.dependencies import jwt_settings
 from fastapi import HTTPException
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -15,11 +16,9 @@ def create_access_token(data: dict):
         
         data.update({"exp": expires})
         
-        secret_key = os.getenv("SECRET_KEY")
+        secret_key, algorithm = jwt_settings()
         if not secret_key:
             raise ValueError("SECRET_KEY not set in environment variables")
-            
-        algorithm = os.getenv("ALGORITHM", "HS256")
         
         return jwt.encode(data, secret_key, algorithm=algorithm)
         
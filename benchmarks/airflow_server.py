@@ -0,0 +1,103 @@
+"""Local stand-in for the Airflow REST API used by /retrain.
+
+Implements the calls the API makes: POST /api/v1/dags/<dag>/dagRuns
+(which creates a run), GET /api/v1/dags/<dag>/dagRuns (the runs, filtered by
+?state=) and GET /api/v1/dags/<dag>/dagRuns/<run_id>. Each response can be
+delayed to emulate a slow webserver. A run is "queued", then "running",
+then "success" once ``run_seconds`` have passed.
+"""
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+RUNS = re.compile(r"^/api/v1/dags/([^/]+)/dagRuns(?:/([^/]+))?$")
+
+
+class AirflowHandler(BaseHTTPRequestHandler):
+    # Set per server by serve_airflow
+    latency = 0.0
+    run_seconds = 1.0
+    runs: dict = {}
+    requests_log: list = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _run(self, dag_id, run_id):
+        created, conf = self.runs[(dag_id, run_id)]
+        age = time.time() - created
+        state = "queued" if age < self.run_seconds / 4 else "running" if age < self.run_seconds else "success"
+        return {
+            "dag_id": dag_id,
+            "dag_run_id": run_id,
+            "state": state,
+            "conf": conf,
+            "start_date": created,
+            "end_date": created + self.run_seconds if state == "success" else None
+        }
+
+    def do_POST(self):
+        match = RUNS.match(self.path)
+        self.requests_log.append(("POST", self.path))
+        time.sleep(self.latency)
+        if not match or match.group(2):
+            self._reply(404, {"title": "Not Found"})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        dag_id = match.group(1)
+        run_id = body.get("dag_run_id") or f"manual__{time.time()}"
+        if (dag_id, run_id) in self.runs:
+            self._reply(409, {"title": "Conflict", "detail": f"DAGRun {run_id} already exists"})
+            return
+        self.runs[(dag_id, run_id)] = (time.time(), body.get("conf", {}))
+        self._reply(200, self._run(dag_id, run_id))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        match = RUNS.match(url.path)
+        self.requests_log.append(("GET", self.path))
+        time.sleep(self.latency)
+        if match and not match.group(2):
+            query = parse_qs(url.query)
+            runs = [self._run(dag_id, run_id) for dag_id, run_id in self.runs if dag_id == match.group(1)]
+            runs = [run for run in runs if not query.get("state") or run["state"] in query["state"]]
+            runs.sort(key=lambda run: run["start_date"], reverse=True)
+            limit = int(query.get("limit", [100])[0])
+            self._reply(200, {"dag_runs": runs[:limit], "total_entries": len(runs)})
+            return
+        key = (match.group(1), unquote(match.group(2))) if match else None
+        if key not in self.runs:
+            self._reply(404, {"title": "DAGRun not found"})
+            return
+        self._reply(200, self._run(*key))
+
+
+@contextmanager
+def serve_airflow(latency=0.0, run_seconds=1.0):
+    """Serve a mock Airflow on a free local port; yields (api_url, requests_log)"""
+    handler = type("Handler", (AirflowHandler,), {
+        "latency": latency,
+        "run_seconds": run_seconds,
+        "runs": {},
+        "requests_log": []
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/api/v1", handler.requests_log
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,157 @@
+"""Auth overhead per request: JWT verification and bcrypt logins, before and after.
+
+Measures, with a token issued by auth.utils.create_access_token:
+
+  - the dependency alone: the former get_current_user (environment read and
+    full jwt.decode on every call) vs the current one, on a token cache miss
+    and hit;
+  - the app through TestClient: GET /admin/model latency with the token
+    cache on and off;
+  - login stalls: GET /admin/model latency while /auth/token logins run
+    concurrently, with bcrypt inline on the event loop (as before) vs in the
+    thread pool.
+
+Run from the project root:
+
+    python -m benchmarks.bench_auth --output auth.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import bcrypt
+from jose import jwt
+
+from benchmarks.bench_inference import api_scratch_env, summarize, time_calls
+
+ADMIN_USERNAME = "bench-admin"
+ADMIN_PASSWORD = "bench-password"
+
+
+def legacy_get_current_user(token):
+    """get_current_user before the token cache"""
+    return jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=[os.getenv("ALGORITHM")])
+
+
+def bench_dependency(token, n_calls):
+    from auth import dependencies
+
+    results = {}
+    latencies, wall = time_calls(lambda: legacy_get_current_user(token), n_calls)
+    results["dependency/legacy"] = summarize(latencies, 1, wall)
+
+    token_cache, uncached = dependencies.token_cache, dependencies.TokenCache(0)
+    dependencies.token_cache = lambda: uncached
+    latencies, wall = time_calls(lambda: dependencies.get_current_user(token), n_calls)
+    results["dependency/cache_miss"] = summarize(latencies, 1, wall)
+
+    dependencies.token_cache = token_cache
+    dependencies.get_current_user(token)
+    latencies, wall = time_calls(lambda: dependencies.get_current_user(token), n_calls)
+    results["dependency/cache_hit"] = summarize(latencies, 1, wall)
+    return results
+
+
+def bench_requests(client, token, n_calls):
+    from auth import dependencies
+
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def get_model():
+        response = client.get("/admin/model", headers=headers)
+        assert response.status_code == 200, response.text
+
+    results = {}
+    token_cache, uncached = dependencies.token_cache, dependencies.TokenCache(0)
+    dependencies.token_cache = lambda: uncached
+    latencies, wall = time_calls(get_model, n_calls)
+    results["api/admin_model/no_token_cache"] = summarize(latencies, 1, wall)
+    dependencies.token_cache = token_cache
+    latencies, wall = time_calls(get_model, n_calls)
+    results["api/admin_model/token_cache"] = summarize(latencies, 1, wall)
+    return results
+
+
+def bench_login_stall(client, api, token, n_calls, n_logins):
+    """Latency of authenticated requests while logins run alongside"""
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def get_model():
+        response = client.get("/admin/model", headers=headers)
+        assert response.status_code == 200, response.text
+
+    def logins():
+        for _ in range(n_logins):
+            response = client.post("/auth/token", data={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+            assert response.status_code == 200, response.text
+
+    async def inline(fn, *args):
+        return fn(*args)
+
+    results = {}
+    threadpool = api.run_in_threadpool
+    for mode in ("inline", "threadpool"):
+        api.run_in_threadpool = inline if mode == "inline" else threadpool
+        try:
+            login_thread = threading.Thread(target=logins)
+            login_thread.start()
+            latencies, wall = time_calls(get_model, n_calls)
+            login_thread.join()
+        finally:
+            api.run_in_threadpool = threadpool
+        # A blocked event loop shows in the worst requests, not the median
+        results[f"api/admin_model/during_logins/bcrypt_{mode}"] = {
+            **summarize(latencies, 1, wall), "max_ms": max(latencies) * 1e3
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000, help="Calls per dependency/request measurement")
+    parser.add_argument("--logins", type=int, default=8, help="Logins run during the stall measurement")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    password_hash = bcrypt.hashpw(ADMIN_PASSWORD.encode(), bcrypt.gensalt(args.bcrypt_rounds)).decode()
+    bcrypt_seconds = time.perf_counter() - started
+
+    api_scratch_env()
+    os.environ.setdefault("MODEL_RELOAD_INTERVAL", "0")
+    os.environ.setdefault("REQUEST_LOG_SAMPLE_RATE", "0")
+    os.environ.update({
+        "SECRET_KEY": "bench-secret",
+        "ALGORITHM": "HS256",
+        "ADMIN_USERNAME": ADMIN_USERNAME,
+        "ADMIN_PASSWORD_HASH": password_hash
+    })
+
+    from fastapi.testclient import TestClient
+    from auth.utils import create_access_token
+    from src.api import api
+
+    token = create_access_token({"sub": ADMIN_USERNAME, "role": "admin"})
+    results = bench_dependency(token, args.calls * 5)
+    with TestClient(api.app) as client:
+        # /admin/model needs a model, loaded in the background from startup
+        api.model_store.ready.wait(timeout=120)
+        results.update(bench_requests(client, token, args.calls))
+        results.update(bench_login_stall(client, api, token, args.calls // 4, args.logins))
+
+    print(f"bcrypt check ~{bcrypt_seconds * 1e3:.0f} ms ({args.bcrypt_rounds} rounds)")
+    print(f"{'measurement':<52} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for key, value in results.items():
+        worst = f"{value['max_ms']:>9.3f}" if "max_ms" in value else f"{'':>9}"
+        print(f"{key:<52} {value['p50_ms']:>9.3f} {value['p95_ms']:>9.3f} {value['p99_ms']:>9.3f} {worst}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"bcrypt_ms": bcrypt_seconds * 1e3, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Raw data download: sequential in-memory requests vs parallel streaming.
+
+Serves synthetic raw files from a local stand-in of the S3 bucket (see
+raw_data_server.py), throttled per connection to emulate a remote link, and
+times:
+
+  - the former loop (one requests.get at a time, whole body in memory),
+  - import_raw_data on an empty folder,
+  - import_raw_data again (every file unchanged, answered with 304),
+  - import_raw_data after an interrupted transfer (resumed with Range).
+
+Run from the project root:
+
+    python -m benchmarks.bench_import_raw_data --accidents 50000 --mbps 20
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+from benchmarks.raw_data_server import BLOCK_SIZE, serve_folder
+from benchmarks.synthetic_baac import write_synthetic_year
+
+# import_raw_data is run as `python src/data/import_raw_data.py`
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "data"))
+import import_raw_data  # noqa: E402
+
+
+def legacy_import(raw_folder, filenames, url):
+    for filename in filenames:
+        response = requests.get(os.path.join(url, filename))
+        with open(os.path.join(raw_folder, filename), "wb") as f:
+            f.write(response.text.encode("utf-8"))
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accidents", type=int, default=50000)
+    parser.add_argument("--mbps", type=float, default=20.0, help="Per-connection throughput (MB/s)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths = write_synthetic_year(tmp / "bucket", 2021, args.accidents)
+        filenames = sorted(path.name for path in paths.values())
+        total_mb = sum(path.stat().st_size for path in paths.values()) / 1e6
+        results = {"files": len(filenames), "total_mb": total_mb, "mbps_per_connection": args.mbps}
+
+        with serve_folder(tmp / "bucket", bytes_per_second=args.mbps * 1e6) as (url, log):
+            (tmp / "legacy").mkdir()
+            results["legacy_s"] = timed(legacy_import, tmp / "legacy", filenames, url)
+            results["parallel_s"] = timed(import_raw_data.import_raw_data, tmp / "raw", filenames, url,
+                                          max_workers=args.workers)
+            for filename in filenames:
+                assert (tmp / "raw" / filename).read_bytes() == (tmp / "bucket" / filename).read_bytes()
+            log.clear()
+            results["unchanged_s"] = timed(import_raw_data.import_raw_data, tmp / "raw", filenames, url,
+                                           max_workers=args.workers)
+            assert all("If-None-Match" in headers for _, headers in log)
+
+        # Drop every transfer halfway once: each file must resume, not restart
+        # (except those of a single block, which the server doesn't cut)
+        for filename in filenames:
+            (tmp / "raw" / filename).unlink()
+        with serve_folder(tmp / "bucket", bytes_per_second=args.mbps * 1e6, drop_first=filenames) as (url, log):
+            results["interrupted_s"] = timed(import_raw_data.import_raw_data, tmp / "raw", filenames, url,
+                                             max_workers=args.workers)
+            cut = [name for name in filenames if (tmp / "bucket" / name).stat().st_size > BLOCK_SIZE]
+            assert sorted(name for name, headers in log if "Range" in headers) == sorted(cut)
+        for filename in filenames:
+            assert (tmp / "raw" / filename).read_bytes() == (tmp / "bucket" / filename).read_bytes()
+
+    print(f"{len(filenames)} files, {total_mb:.1f} MB at {args.mbps:.0f} MB/s per connection")
+    for key in ["legacy_s", "parallel_s", "unchanged_s", "interrupted_s"]:
+        print(f"{key[:-2]:<12} {results[key]:>7.2f}s")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
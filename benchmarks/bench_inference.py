@@ -0,0 +1,230 @@
+"""Serving latency and throughput: the raw model and the FastAPI app in-process.
+
+Rows are synthetic, shaped like src/models/test_features.json. Measures
+p50/p95/p99 latency and rows/sec for:
+
+  - the model alone: predict_proba (sklearn and FlatForest) at each batch
+    size, and the compiled single-row path;
+  - the app through TestClient (no network, auth stubbed by overriding
+    get_admin_user): /predict at several concurrency levels, and
+    /predict/batch at each batch size.
+
+Results are saved as JSON; with --baseline, every measurement is compared
+with a previous run and the exit code is 1 if any regressed beyond
+--tolerance.
+
+Run from the project root (the API loads src/models/prod_model.joblib):
+
+    python -m benchmarks.bench_inference --output bench.json
+    python -m benchmarks.bench_inference --baseline bench.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+FEATURES_PATH = "src/models/test_features.json"
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+CONCURRENCY = (1, 4, 16, 64)
+
+
+def api_scratch_env():
+    """Point the in-process API at a temporary directory: an empty MLflow
+    store, and the request log and users database outside the working tree"""
+    scratch = tempfile.mkdtemp(prefix="bench-api-")
+    os.environ.setdefault("MLFLOW_TRACKING_URI", f"file://{scratch}/mlruns")
+    os.environ.setdefault("MLFLOW_REGISTRY_URI", f"file://{scratch}/mlruns")
+    os.environ.setdefault("API_LOG_FILE", os.path.join(scratch, "api.log"))
+    os.environ.setdefault("USERS_DB_PATH", os.path.join(scratch, "users.db"))
+
+
+def synthetic_rows(names, base, n_rows, seed=0):
+    """Rows around the test_features.json example: code columns stay integers"""
+    rng = np.random.default_rng(seed)
+    base = np.asarray(base, dtype=np.float64)
+    noise = rng.normal(0, 1, (n_rows, len(names))) * np.maximum(np.abs(base) * 0.2, 1)
+    rows = base + noise
+    integer_columns = np.array([float(value).is_integer() for value in base])
+    rows[:, integer_columns] = np.round(rows[:, integer_columns])
+    return rows.astype(np.float32)
+
+
+def summarize(latencies, rows_per_call, wall_seconds):
+    latencies = np.asarray(latencies) * 1e3
+    return {
+        "calls": int(latencies.size),
+        "rows_per_call": rows_per_call,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "rows_per_s": float(latencies.size * rows_per_call / wall_seconds)
+    }
+
+
+def time_calls(fn, n_calls, concurrency=1):
+    """Latency of each of n_calls calls to fn, run by `concurrency` threads"""
+    def timed(_):
+        started = time.perf_counter()
+        fn()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        latencies = [timed(i) for i in range(n_calls)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed, range(n_calls)))
+    return latencies, time.perf_counter() - started
+
+
+def calls_for(batch_size, budget_rows):
+    return max(5, min(500, budget_rows // batch_size))
+
+
+def bench_model(loaded, X, budget_rows):
+    from src.models.forest_engine import FlatForest
+
+    results = {}
+    model = loaded.model
+    if hasattr(model, "estimators_"):
+        engines = {"sklearn": model, "flat": FlatForest.from_sklearn(model)}
+    else:
+        # MODEL_FORMAT=flat: the API already serves a FlatForest
+        engines = {"flat": model}
+    for engine, estimator in engines.items():
+        for batch_size in BATCH_SIZES:
+            batch = X[:batch_size]
+            estimator.predict_proba(batch)
+            latencies, wall = time_calls(lambda: estimator.predict_proba(batch), calls_for(batch_size, budget_rows))
+            results[f"model/{engine}/batch={batch_size}"] = summarize(latencies, batch_size, wall)
+
+    row = X[0]
+    latencies, wall = time_calls(lambda: loaded.compiled.predict_one(row), 500)
+    results["model/compiled/predict_one"] = summarize(latencies, 1, wall)
+    return results
+
+
+def bench_api(client, X, budget_rows):
+    results = {}
+    rows = X.tolist()
+    row_index = itertools.count()
+
+    def post_single():
+        response = client.post("/predict", json={"features": rows[next(row_index) % len(rows)]})
+        assert response.status_code == 200, response.text
+
+    for concurrency in CONCURRENCY:
+        latencies, wall = time_calls(post_single, max(200, 25 * concurrency), concurrency)
+        results[f"api/predict/concurrency={concurrency}"] = summarize(latencies, 1, wall)
+
+    for batch_size in BATCH_SIZES:
+        body = json.dumps(rows[:batch_size])
+
+        def post_batch():
+            response = client.post("/predict/batch", content=body, headers={"Content-Type": "application/json"})
+            assert response.status_code == 200, response.text
+
+        latencies, wall = time_calls(post_batch, calls_for(batch_size, budget_rows))
+        results[f"api/batch/batch={batch_size}"] = summarize(latencies, batch_size, wall)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every shared measurement; returns the regressed keys"""
+    regressions = []
+    print(f"\n{'measurement':<36} {'p50':>9} {'p95':>9} {'rows/s':>9}")
+    for key, current in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        p50 = current["p50_ms"] / before["p50_ms"] - 1
+        p95 = current["p95_ms"] / before["p95_ms"] - 1
+        throughput = current["rows_per_s"] / before["rows_per_s"] - 1
+        regressed = p50 > tolerance or throughput < -tolerance
+        if regressed:
+            regressions.append(key)
+        print(f"{key:<36} {p50:>+8.0%} {p95:>+8.0%} {throughput:>+8.0%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-rows", type=int, default=50000,
+                        help="Rows scored per measurement (bounds the number of calls)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare with the results JSON of a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative p50/throughput change counted as a regression")
+    args = parser.parse_args()
+
+    # In-process app: no registry, no hot reload, no prediction cache
+    api_scratch_env()
+    os.environ.setdefault("MODEL_RELOAD_INTERVAL", "0")
+    os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    from fastapi.testclient import TestClient
+    from auth.dependencies import get_admin_user
+    from src.api import api
+
+    # One INFO line per request would dominate the timings
+    logging.getLogger(api.__name__).setLevel(logging.WARNING)
+    logging.getLogger("api.requests").setLevel(logging.WARNING)
+
+    api.app.dependency_overrides[get_admin_user] = lambda: {"sub": "bench", "role": "admin"}
+    with TestClient(api.app) as client:
+        # The model is loaded in the background from startup
+        api.model_store.ready.wait(timeout=120)
+        loaded = api.model_store.current
+        if loaded is None or loaded.compiled is None:
+            sys.exit("No model loaded by the API (expected src/models/prod_model.joblib)")
+        with open(FEATURES_PATH) as f:
+            example = json.load(f)
+        names = loaded.compiled.feature_names
+        X = synthetic_rows(names, [example[name] for name in names], max(BATCH_SIZES))
+
+        results = bench_model(loaded, X, args.budget_rows)
+        results.update(bench_api(client, X, args.budget_rows))
+
+    print(f"{'measurement':<36} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rows/s':>11}")
+    for key, value in results.items():
+        print(f"{key:<36} {value['p50_ms']:>9.3f} {value['p95_ms']:>9.3f} {value['p99_ms']:>9.3f} "
+              f"{value['rows_per_s']:>11.0f}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "model_version": loaded.version,
+            "model_source": loaded.source,
+            "n_features": len(names),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": __import__("sklearn").__version__
+        },
+        "results": results
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
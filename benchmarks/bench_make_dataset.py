@@ -0,0 +1,146 @@
+"""Per-stage timings of make_dataset.process_data, row loops vs vectorized.
+
+Generates synthetic raw files (see synthetic_baac.py), then times each
+feature-engineering stage with the former pandas apply/loop implementation
+and with the current vectorized helpers, and finally the whole process_data
+(cold, then again with the year partition cached, and optionally under a
+memory budget).
+
+Run from the project root:
+
+    python -m benchmarks.bench_make_dataset --accidents 100000
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_baac import write_synthetic_year
+from src.data import make_dataset
+
+CATV_VALUE = [0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,30,31,32,33,34,35,36,37,38,39,40,41,42,43,50,60,80,99]
+CATV_VALUE_NEW = [0,1,1,2,1,1,6,2,5,5,5,5,5,4,4,4,4,4,3,3,4,4,1,1,1,1,1,6,6,3,3,3,3,1,1,1,1,1,0,0]
+ATM_MAP = {1:0, 2:1, 3:1, 4:1, 5:1, 6:1, 7:1, 8:0, 9:0}
+
+
+def legacy_year_acc(users):
+    return users["Num_Acc"].astype(str).apply(lambda x: x[:4]).astype(int)
+
+
+def legacy_victim_age(users, year_acc):
+    victim_age = year_acc - users["an_nais"]
+    for i in victim_age:
+        if (i > 120) | (i < 0):
+            victim_age.replace(i, np.nan)
+    return victim_age
+
+
+def legacy_hour(caract):
+    return caract["hrmn"].astype(str).apply(lambda x: x[:-3]).astype(int)
+
+
+def legacy_dep_com(caract):
+    out = {}
+    for col in ["dep", "com"]:
+        values = caract[col].str.replace("2A", "201")
+        values = values.str.replace("2B", "202")
+        out[col] = values.astype(int)
+    return out
+
+
+def legacy_remaps(users, caract, veh):
+    return (
+        users["grav"].replace({1:1, 2:3, 3:4, 4:2}),
+        caract["atm"].replace(ATM_MAP),
+        veh["catv"].replace(dict(zip(CATV_VALUE, CATV_VALUE_NEW)))
+    )
+
+
+def vectorized_dep_com(caract):
+    return {col: make_dataset._corsica_codes_to_int(caract[col]) for col in ["dep", "com"]}
+
+
+def vectorized_remaps(users, caract, veh):
+    return (
+        make_dataset._remap_codes(users["grav"], {1:1, 2:3, 3:4, 4:2}),
+        make_dataset._remap_codes(caract["atm"], ATM_MAP),
+        make_dataset._remap_codes(veh["catv"], dict(zip(CATV_VALUE, CATV_VALUE_NEW)))
+    )
+
+
+def best_of(fn, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accidents", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--memory-budget", type=int,
+                        help="Also time process_data with this memory budget (MB)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_synthetic_year(Path(tmp) / "raw", 2021, args.accidents)
+        users = pd.read_csv(paths["users"], sep=";")
+        caract = pd.read_csv(paths["caract"], sep=";", low_memory=False)
+        veh = pd.read_csv(paths["veh"], sep=";")
+        year_acc = make_dataset._year_from_num_acc(users["Num_Acc"])
+
+        stages = [
+            ("year_acc", legacy_year_acc, lambda u: make_dataset._year_from_num_acc(u["Num_Acc"]), (users,)),
+            ("victim_age", legacy_victim_age, lambda u, y: make_dataset._victim_age(y, u["an_nais"]), (users, year_acc)),
+            ("hour", legacy_hour, lambda c: make_dataset._hour_from_hrmn(c["hrmn"]), (caract,)),
+            ("dep/com", legacy_dep_com, vectorized_dep_com, (caract,)),
+            ("code remaps", legacy_remaps, vectorized_remaps, (users, caract, veh)),
+        ]
+
+        results = {"accidents": args.accidents, "users": len(users), "stages": {}}
+        print(f"{len(users)} users / {len(caract)} accidents")
+        print(f"{'stage':<14} {'before':>10} {'after':>10} {'speedup':>8}")
+        for name, before_fn, after_fn, stage_args in stages:
+            before = best_of(before_fn, *stage_args, repeat=args.repeat)
+            after = best_of(after_fn, *stage_args, repeat=args.repeat)
+            results["stages"][name] = {"before_s": before, "after_s": after}
+            print(f"{name:<14} {before * 1e3:>8.1f}ms {after * 1e3:>8.1f}ms {before / after:>7.1f}x")
+
+        started = time.perf_counter()
+        make_dataset.process_data(
+            {2021: paths}, Path(tmp) / "preprocessed", cache_folderpath=Path(tmp) / "interim"
+        )
+        results["process_data_s"] = time.perf_counter() - started
+        print(f"{'process_data':<14} {results['process_data_s']:>19.2f}s")
+
+        # Second run: the 2021 partition comes from the cache
+        started = time.perf_counter()
+        make_dataset.process_data(
+            {2021: paths}, Path(tmp) / "preprocessed", cache_folderpath=Path(tmp) / "interim"
+        )
+        results["process_data_cached_s"] = time.perf_counter() - started
+        print(f"{'  (cached)':<14} {results['process_data_cached_s']:>19.2f}s")
+
+        if args.memory_budget:
+            started = time.perf_counter()
+            make_dataset.process_data(
+                {2021: paths}, Path(tmp) / "preprocessed", cache_folderpath=Path(tmp) / "interim-budget",
+                memory_budget=args.memory_budget * 2**20
+            )
+            results["process_data_budget_s"] = time.perf_counter() - started
+            print(f"{'  (budget)':<14} {results['process_data_budget_s']:>19.2f}s")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Per-worker memory of the served model, pickle vs memory-mapped FlatForest.
+
+Starts N worker processes that each load the model the way an API worker
+would, run a prediction and then report their RSS and PSS while all of them
+are alive. RSS counts shared pages in every process; PSS splits them between
+the sharers, so the summed PSS is what the node actually pays.
+
+Run from the project root:
+
+    python -m benchmarks.bench_model_memory --workers 4
+"""
+import argparse
+import json
+import multiprocessing as mp
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from src.models.forest_engine import FlatForest
+
+MODES = ("joblib", "flat", "flat-mmap")
+
+
+def _memory_kb():
+    """(RSS, PSS) of the current process in kB, from /proc (Linux only)."""
+    values = {}
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0])
+    return values.get("Rss", 0), values.get("Pss", 0)
+
+
+def _worker(mode, model_path, flat_path, barrier, results):
+    # Unpickling needs sklearn: import it first so only the model is measured
+    import sklearn.ensemble  # noqa: F401
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    rss_before, pss_before = _memory_kb()
+    started = time.perf_counter()
+    if mode == "joblib":
+        model = joblib.load(model_path)
+    else:
+        model = FlatForest.load(flat_path, mmap_mode="r" if mode == "flat-mmap" else None)
+    load_s = time.perf_counter() - started
+
+    # Touch every tree the way real traffic does before measuring
+    X = np.zeros((256, len(model.feature_names_in_)), dtype=np.float32)
+    model.predict_proba(X)
+
+    barrier.wait()
+    rss_after, pss_after = _memory_kb()
+    results.put({
+        "rss_model_mb": (rss_after - rss_before) / 1024,
+        "pss_model_mb": (pss_after - pss_before) / 1024,
+        "rss_total_mb": rss_after / 1024,
+        "pss_total_mb": pss_after / 1024,
+        "load_s": load_s
+    })
+    barrier.wait()
+
+
+def measure(mode, model_path, flat_path, workers):
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker, args=(mode, model_path, flat_path, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    mean = lambda key: float(np.mean([row[key] for row in rows]))
+    return {
+        "mode": mode,
+        "workers": workers,
+        "rss_model_mb_per_worker": mean("rss_model_mb"),
+        "pss_model_mb_per_worker": mean("pss_model_mb"),
+        "pss_total_mb_all_workers": float(sum(row["pss_total_mb"] for row in rows)),
+        "load_s_per_worker": mean("load_s")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="src/models/prod_model.joblib")
+    parser.add_argument("--flat", default="src/models/prod_model_flat",
+                        help="FlatForest bundle; exported from --model if missing")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    flat_path = Path(args.flat)
+    with tempfile.TemporaryDirectory() as tmp:
+        if not (flat_path / "meta.json").exists():
+            flat_path = Path(tmp) / "flat"
+            FlatForest.from_sklearn(joblib.load(args.model)).save(flat_path)
+
+        results = [measure(mode, args.model, flat_path, args.workers) for mode in MODES]
+
+    print(f"{'mode':<10} {'RSS/worker':>11} {'PSS/worker':>11} {'PSS total':>10} {'load':>8}")
+    for row in results:
+        print(
+            f"{row['mode']:<10} {row['rss_model_mb_per_worker']:>9.1f}MB "
+            f"{row['pss_model_mb_per_worker']:>9.1f}MB {row['pss_total_mb_all_workers']:>8.1f}MB "
+            f"{row['load_s_per_worker']:>7.3f}s"
+        )
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
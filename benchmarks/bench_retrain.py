@@ -0,0 +1,140 @@
+"""/retrain against a local mock Airflow: event-loop stalls, deduplication, status caching.
+
+Measures, with the mock webserver answering after --airflow-latency seconds:
+
+  - /predict latency while /retrain calls run alongside, with the former
+    trigger (requests.post on the event loop) vs the httpx one;
+  - DAG runs created by --concurrent simultaneous /retrain calls;
+  - Airflow requests made by --polls calls of GET /retrain/{run_id}.
+
+Run from the project root (the API loads src/models/prod_model.joblib):
+
+    python -m benchmarks.bench_retrain --output retrain.json
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.airflow_server import serve_airflow
+from benchmarks.bench_inference import FEATURES_PATH, api_scratch_env, summarize, time_calls
+
+
+def legacy_trigger(dag_trigger):
+    """DagTrigger.trigger as /retrain did it before: a blocking requests.post"""
+    async def trigger():
+        import requests
+
+        response = requests.post(
+            dag_trigger.runs_url,
+            json={"dag_run_id": f"manual_run_{time.time()}", "conf": {}},
+            timeout=dag_trigger.timeout
+        )
+        response.raise_for_status()
+        return response.json(), True
+    return trigger
+
+
+def bench_predict_during_retrain(client, api, features, n_calls, n_retrains):
+    """Against an Airflow whose runs finish at once, so that every /retrain triggers one"""
+    results = {}
+    trigger = api.dag_trigger.trigger
+    for mode in ("requests_blocking", "httpx_async"):
+        api.dag_trigger.trigger = legacy_trigger(api.dag_trigger) if mode == "requests_blocking" else trigger
+
+        def retrains():
+            for _ in range(n_retrains):
+                response = client.post("/retrain")
+                assert response.status_code == 200, response.text
+
+        def predict():
+            response = client.post("/predict/named", json={"features": features})
+            assert response.status_code == 200, response.text
+
+        try:
+            retrain_thread = threading.Thread(target=retrains)
+            retrain_thread.start()
+            latencies, wall = time_calls(predict, n_calls)
+            retrain_thread.join()
+        finally:
+            api.dag_trigger.trigger = trigger
+        results[f"predict/during_retrain/{mode}"] = {**summarize(latencies, 1, wall), "max_ms": max(latencies) * 1e3}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--airflow-latency", type=float, default=0.5, help="Seconds per mock Airflow response")
+    parser.add_argument("--calls", type=int, default=400, help="/predict calls per stall measurement")
+    parser.add_argument("--retrains", type=int, default=4, help="/retrain calls during the stall measurement")
+    parser.add_argument("--concurrent", type=int, default=8, help="Simultaneous /retrain calls")
+    parser.add_argument("--polls", type=int, default=200, help="GET /retrain/{run_id} calls")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    api_scratch_env()
+    os.environ.setdefault("MODEL_RELOAD_INTERVAL", "0")
+    os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+    os.environ.setdefault("REQUEST_LOG_SAMPLE_RATE", "0")
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    with serve_airflow(latency=args.airflow_latency, run_seconds=0) as (instant_airflow_url, _), \
+            serve_airflow(latency=args.airflow_latency, run_seconds=60) as (airflow_url, airflow_log):
+        os.environ["AIRFLOW_API_URL"] = instant_airflow_url
+
+        from fastapi.testclient import TestClient
+        from auth.dependencies import get_admin_user
+        from src.api import api
+
+        logging.getLogger(api.__name__).setLevel(logging.WARNING)
+        api.app.dependency_overrides[get_admin_user] = lambda: {"sub": "bench", "role": "admin"}
+        with open(FEATURES_PATH) as f:
+            features = json.load(f)
+
+        with TestClient(api.app) as client:
+            api.model_store.ready.wait(timeout=120)
+            results = bench_predict_during_retrain(client, api, features, args.calls, args.retrains)
+
+            # Runs last a minute from here on: the first /retrain starts one,
+            # the others must return it
+            api.dag_trigger.api_url = airflow_url
+            posts_before = sum(method == "POST" for method, _ in airflow_log)
+            with ThreadPoolExecutor(args.concurrent) as pool:
+                responses = list(pool.map(lambda _: client.post("/retrain").json(), range(args.concurrent)))
+            run_ids = {response["dag_run_id"] for response in responses}
+            counts = {
+                "retrain_calls": args.concurrent,
+                "dag_runs_created": sum(method == "POST" for method, _ in airflow_log) - posts_before,
+                "distinct_run_ids": len(run_ids)
+            }
+
+            run_id = run_ids.pop()
+            gets_before = sum(method == "GET" for method, _ in airflow_log)
+            started = time.perf_counter()
+            for _ in range(args.polls):
+                response = client.get(f"/retrain/{run_id}")
+                assert response.status_code == 200, response.text
+            counts.update({
+                "status_polls": args.polls,
+                "status_polls_seconds": time.perf_counter() - started,
+                "airflow_status_requests": sum(method == "GET" for method, _ in airflow_log) - gets_before
+            })
+
+    print(f"{'measurement':<44} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for key, value in results.items():
+        print(f"{key:<44} {value['p50_ms']:>9.3f} {value['p95_ms']:>9.3f} {value['p99_ms']:>9.3f} "
+              f"{value['max_ms']:>9.3f}")
+    for key, value in counts.items():
+        print(f"{key:<44} {value:>9.3g}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"results": results, "counts": counts}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""FlatForest vs sklearn predict_proba on fixed forests and datasets.
+
+Fits seeded RandomForestClassifiers in a few configurations (shallow and
+deep trees, class weights, several classes, integer code columns like the
+BAAC ones) and checks that FlatForest gives the same probabilities and
+classes, as built in memory and after a save/load round trip (plain and
+memory-mapped). Besides random rows, the inputs include rows sitting
+exactly on split thresholds, where a wrong comparison would show.
+
+Exits with status 1 on any divergence, so CI can run it:
+
+    python -m benchmarks.check_flat_forest
+"""
+import argparse
+import sys
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from src.models.forest_engine import FlatForest, check_parity
+
+CONFIGS = {
+    "default": {"n_estimators": 20},
+    "shallow": {"n_estimators": 10, "max_depth": 3},
+    "deep_leaves": {"n_estimators": 15, "min_samples_leaf": 1, "max_features": None},
+    "class_weight": {"n_estimators": 10, "class_weight": "balanced", "min_samples_leaf": 5},
+    "multiclass": {"n_estimators": 10, "n_classes": 3},
+}
+
+
+def make_dataset(n_rows, n_classes, seed):
+    """Mixed continuous and integer code columns, with a learnable label"""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        "lat": rng.normal(46.5, 2.0, n_rows),
+        "long": rng.normal(2.5, 2.5, n_rows),
+        "hour": rng.integers(0, 24, n_rows),
+        "catv": rng.integers(0, 7, n_rows),
+        "lum": rng.integers(1, 6, n_rows),
+        "nb_victim": rng.integers(1, 5, n_rows),
+    })
+    score = 0.4 * X["catv"] - 0.3 * X["lum"] + 0.1 * X["hour"] + rng.normal(0, 1, n_rows)
+    y = np.digitize(score, np.quantile(score, np.linspace(0, 1, n_classes + 1)[1:-1]))
+    return X, y
+
+
+def threshold_rows(model, X, n_rows, seed):
+    """Rows of X with one feature set exactly to a split threshold of the forest"""
+    rng = np.random.default_rng(seed)
+    splits = [
+        (feature, threshold)
+        for estimator in model.estimators_
+        for feature, threshold in zip(estimator.tree_.feature, estimator.tree_.threshold)
+        if feature >= 0
+    ]
+    rows = X.iloc[rng.integers(0, len(X), n_rows)].to_numpy(dtype=np.float64)
+    for row, index in zip(rows, rng.integers(0, len(splits), n_rows)):
+        feature, threshold = splits[index]
+        row[feature] = threshold
+    return pd.DataFrame(rows, columns=X.columns)
+
+
+def check_config(name, params, n_rows, seed):
+    params = dict(params)
+    X, y = make_dataset(n_rows, params.pop("n_classes", 2), seed)
+    model = RandomForestClassifier(random_state=seed, **params).fit(X, y)
+    X_check = pd.concat([X, threshold_rows(model, X, n_rows // 2, seed)], ignore_index=True)
+
+    forest = FlatForest.from_sklearn(model)
+    with tempfile.TemporaryDirectory() as tmp:
+        forest.save(tmp)
+        for label, candidate in [("memory", forest),
+                                 ("loaded", FlatForest.load(tmp)),
+                                 ("mmap", FlatForest.load(tmp, mmap_mode="r"))]:
+            check_parity(model, candidate, X_check)
+            if not np.array_equal(model.predict(X_check), candidate.predict(X_check)):
+                raise ValueError("predicted classes differ")
+            print(f"{name:<14} {label:<7} {len(X_check):>6} rows  {forest.n_estimators:>3} trees  "
+                  f"{len(forest.feature):>7} nodes  OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4000, help="Training rows per configuration")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    failed = []
+    for name, params in CONFIGS.items():
+        try:
+            check_config(name, params, args.rows, args.seed)
+        except ValueError as e:
+            print(f"{name:<14} FAILED: {e}")
+            failed.append(name)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Local stand-in for the S3 bucket of raw files.
+
+Serves a folder over HTTP the way S3 does for import_raw_data: quoted MD5
+ETags, If-None-Match (304), Range/If-Range (206) requests. It can throttle
+each response to emulate a remote link, and cut the first response of a
+file halfway through (but after at least one block; files of a single
+block are never cut) to exercise resumption.
+"""
+import hashlib
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+RANGE = re.compile(r"bytes=(\d+)-$")
+# Bytes written (and throttled) at a time
+BLOCK_SIZE = 64 * 1024
+
+
+class RawDataHandler(BaseHTTPRequestHandler):
+    # Set per server by serve_folder
+    folder: Path
+    bytes_per_second = None
+    drop_first: set = set()
+    requests_log: list = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.folder / self.path.lstrip("/").split("?")[0]
+        if not path.is_file():
+            self.send_error(404)
+            return
+        body = path.read_bytes()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        self.requests_log.append((path.name, dict(self.headers)))
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start = 0
+        match = RANGE.match(self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range", etag) == etag:
+            start = int(match.group(1))
+            if start >= len(body):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+
+        payload = memoryview(body)[start:]
+        if path.name in self.drop_first:
+            self.drop_first.discard(path.name)
+            # Half of the body, at least a block so that the client has
+            # something on disk to resume from, then close the connection
+            cut = max(len(payload) // 2, BLOCK_SIZE)
+            if cut < len(payload):
+                self._send(payload[:cut])
+                self.close_connection = True
+                return
+        self._send(payload)
+
+    def _send(self, payload, block_size=BLOCK_SIZE):
+        for offset in range(0, len(payload), block_size):
+            block = payload[offset:offset + block_size]
+            self.wfile.write(block)
+            if self.bytes_per_second:
+                time.sleep(len(block) / self.bytes_per_second)
+
+
+@contextmanager
+def serve_folder(folder, bytes_per_second=None, drop_first=()):
+    """Serve folder on a free local port; yields (base_url, requests_log)"""
+    handler = type("Handler", (RawDataHandler,), {
+        "folder": Path(folder),
+        "bytes_per_second": bytes_per_second,
+        "drop_first": set(drop_first),
+        "requests_log": []
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/", handler.requests_log
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,121 @@
+"""Synthetic BAAC accident files shaped like the 2021 open-data release.
+
+Only the layout and value ranges matter here (every column, ';' separator,
+'HH:MM' times, decimal commas, Corsican '2A'/'2B' codes), so the benchmarks
+can exercise make_dataset at any scale without downloading real data.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CATV_CODES = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21,
+              30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 50, 60, 80, 99]
+DEPARTMENTS = ["75", "13", "69", "33", "59", "77", "2A", "2B", "971", "974"]
+
+
+def _write(df: pd.DataFrame, path: Path):
+    df.to_csv(path, sep=";", index=False)
+
+
+def write_synthetic_year(folder, year: int = 2021, n_accidents: int = 50000, seed: int = 0):
+    """Write the four raw files for ``year`` into ``folder``; return their paths."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed + year)
+    n = n_accidents
+
+    num_acc = year * 10**8 + np.arange(1, n + 1)
+    dep = rng.choice(DEPARTMENTS, n)
+    com = np.char.add(dep.astype(str), np.char.zfill(rng.integers(1, 999, n).astype(str), 3))
+    caract = pd.DataFrame({
+        "Num_Acc": num_acc,
+        "jour": rng.integers(1, 29, n),
+        "mois": rng.integers(1, 13, n),
+        "an": year,
+        "hrmn": [f"{h:02d}:{m:02d}" for h, m in zip(rng.integers(0, 24, n), rng.integers(0, 60, n))],
+        "lum": rng.integers(1, 6, n),
+        "dep": dep,
+        "com": com,
+        "agg": rng.integers(1, 3, n),
+        "int": rng.integers(1, 10, n),
+        "atm": rng.integers(-1, 10, n),
+        "col": rng.integers(-1, 8, n),
+        "adr": "RUE DE LA PAIX",
+        "lat": np.char.replace(np.round(rng.uniform(41, 51, n), 5).astype(str), ".", ","),
+        "long": np.char.replace(np.round(rng.uniform(-5, 9, n), 5).astype(str), ".", ",")
+    })
+
+    places = pd.DataFrame({
+        "Num_Acc": num_acc,
+        "catr": rng.integers(1, 8, n),
+        "voie": rng.integers(1, 1000, n),
+        "v1": 0,
+        "v2": "",
+        "circ": rng.integers(-1, 5, n),
+        "nbv": rng.integers(1, 5, n),
+        "vosp": rng.integers(0, 4, n),
+        "prof": rng.integers(1, 5, n),
+        "pr": rng.integers(0, 50, n),
+        "pr1": rng.integers(0, 999, n),
+        "plan": rng.integers(1, 5, n),
+        "lartpc": "",
+        "larrout": rng.integers(0, 20, n),
+        "surf": rng.integers(-1, 10, n),
+        "infra": rng.integers(0, 10, n),
+        "situ": rng.integers(-1, 9, n),
+        "vma": rng.choice([30, 50, 70, 80, 90, 110, 130, -1], n)
+    })
+
+    n_veh = rng.integers(1, 4, n)
+    veh_acc = np.repeat(num_acc, n_veh)
+    veh_rank = np.concatenate([np.arange(k) for k in n_veh])
+    m = len(veh_acc)
+    id_vehicule = np.char.add(np.char.add(
+        (veh_acc % 10**6).astype(str), " "), veh_rank.astype(str))
+    num_veh = np.char.add("A0", (veh_rank + 1).astype(str))
+    vehicles = pd.DataFrame({
+        "Num_Acc": veh_acc,
+        "id_vehicule": id_vehicule,
+        "num_veh": num_veh,
+        "senc": rng.integers(0, 3, m),
+        "catv": rng.choice(CATV_CODES, m),
+        "obs": rng.integers(-1, 17, m),
+        "obsm": rng.integers(-1, 10, m),
+        "choc": rng.integers(0, 10, m),
+        "manv": rng.integers(0, 27, m),
+        "motor": rng.integers(-1, 7, m),
+        "occutc": ""
+    })
+
+    n_users = rng.integers(1, 4, m)
+    k = int(n_users.sum())
+    users = pd.DataFrame({
+        "Num_Acc": np.repeat(veh_acc, n_users),
+        "id_vehicule": np.repeat(id_vehicule, n_users),
+        "num_veh": np.repeat(num_veh, n_users),
+        "place": rng.integers(1, 11, k),
+        "catu": rng.integers(1, 4, k),
+        "grav": rng.integers(1, 5, k),
+        "sexe": rng.integers(1, 3, k),
+        "an_nais": rng.integers(year - 100, year + 1, k),
+        "trajet": rng.integers(-1, 10, k),
+        "secu1": rng.integers(-1, 10, k),
+        "secu2": rng.integers(-1, 10, k),
+        "secu3": rng.integers(-1, 10, k),
+        "locp": rng.integers(-1, 10, k),
+        "actp": rng.choice(["-1", "0", "A", "B"], k),
+        "etatp": rng.integers(-1, 4, k)
+    })
+
+    paths = {
+        "caract": folder / f"caracteristiques-{year}.csv",
+        "places": folder / f"lieux-{year}.csv",
+        "veh": folder / f"vehicules-{year}.csv",
+        "users": folder / f"usagers-{year}.csv"
+    }
+    _write(caract, paths["caract"])
+    _write(places, paths["places"])
+    _write(vehicles, paths["veh"])
+    _write(users, paths["users"])
+    return paths
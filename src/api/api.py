@@ -1,29 +1,34 @@
 import os
+import json
+import shutil
 import time
 import logging
-from typing import List
+import warnings
+from typing import Dict, List, Optional, Tuple
 
-import pandas as pd
+import numpy as np
 import joblib
 import bcrypt
-import requests
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from fastapi import FastAPI, HTTPException, Depends, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 
-import mlflow
-import mlflow.pyfunc
-import mlflow.sklearn
-import mlflow.exceptions
-import mlflow.tracking
-import mlflow.store.artifact.artifact_repo
-
-from auth.dependencies import get_current_user, get_admin_user
+from auth.dependencies import get_current_user, get_admin_user, jwt_settings
 from auth.models import Token
 from auth.utils import create_access_token
+from src.api.artifact_cache import ArtifactCache
+from src.api.batching import MicroBatcher
+from src.api.cache import PredictionCache
+from src.api.inference import Features
+from src.api.metrics import BATCH_SIZE_BUCKETS, CONTENT_TYPE, MetricsMiddleware, MetricsRegistry
+from src.api.model_store import LoadedModel, ModelStore, load_warmup_features
+from src.api.retrain import AirflowError, DagTrigger
+from src.api.request_log import PredictionCapture, RequestLogMiddleware, set_request_fields, setup_logging
+from src.models.forest_engine import FlatForest
 
 
 app = FastAPI(
@@ -32,23 +37,89 @@ app = FastAPI(
     swagger_ui_parameters={"defaultModelsExpandDepth": -1}
 )
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('api.log')
-    ]
+load_dotenv()
+
+# JSON log records are queued and written to stderr and API_LOG_FILE by a
+# background thread, never on the event loop
+log_writer = setup_logging(
+    os.getenv("API_LOG_FILE", "api.log"),
+    max_queue=int(os.getenv("API_LOG_QUEUE_SIZE", "10000"))
 )
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+# Share of successful predictions that get a request log record (errors always do)
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1.0"))
+PREDICTION_ROUTES = ("/predict", "/predict/named", "/predict/batch")
+
+# Optional NDJSON capture of prediction inputs/outputs (e.g. for drift analysis); "" = off
+PREDICTION_CAPTURE_PATH = os.getenv("PREDICTION_CAPTURE_PATH", "")
+PREDICTION_CAPTURE_MAX_MB = float(os.getenv("PREDICTION_CAPTURE_MAX_MB", "100"))
+PREDICTION_CAPTURE_BACKUPS = int(os.getenv("PREDICTION_CAPTURE_BACKUPS", "5"))
+PREDICTION_CAPTURE_SAMPLE_RATE = float(os.getenv("PREDICTION_CAPTURE_SAMPLE_RATE", "1.0"))
 
-mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://mlflow:5000"))
-mlflow.set_registry_uri(os.getenv("MLFLOW_REGISTRY_URI", "http://mlflow:5000"))
+_mlflow_module = None
+
+def _mlflow():
+    """mlflow, imported on first use: the import alone takes seconds, and
+    startup must not wait for it"""
+    global _mlflow_module
+    if _mlflow_module is None:
+        import mlflow
+        import mlflow.artifacts
+        import mlflow.pyfunc
+        import mlflow.tracking
+        mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://mlflow:5000"))
+        mlflow.set_registry_uri(os.getenv("MLFLOW_REGISTRY_URI", "http://mlflow:5000"))
+        _mlflow_module = mlflow
+    return _mlflow_module
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Upper bound on rows accepted by /predict/batch in a single call
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "10000"))
+
+# Batch rows are validated into a plain array laid out in feature_names_in_
+# order, so sklearn's missing-feature-names warning is expected noise here.
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+# Optional micro-batching of concurrent /predict calls
+MICROBATCH_ENABLED = os.getenv("PREDICT_MICROBATCH", "false").lower() in ("1", "true", "yes")
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+
+# "joblib" serves the sklearn forest, "flat" the array-based FlatForest
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "joblib").lower()
+FLAT_MODEL_PATH = "src/models/prod_model_flat"
+# Memory-map flat forests so all uvicorn workers on a node share one copy
+MODEL_MMAP = os.getenv("MODEL_MMAP", "false").lower() in ("1", "true", "yes")
+FLAT_CACHE_DIR = "src/models/.flat_cache"
+# Flattened bundles of the N most recently used versions are kept (0 = keep all)
+FLAT_CACHE_KEEP = int(os.getenv("FLAT_CACHE_KEEP", "3"))
+LOCAL_MODEL_PATH = "src/models/prod_model.joblib"
+REGISTRY_MODEL_NAME = "Accidents_RF_Model"
+REGISTRY_ALIAS = "champion"
+# Registry artifacts are downloaded once per model version into this
+# directory; only the alias lookup goes to the registry when it's cached.
+# The N most recently used versions are kept (0 = keep all)
+MODEL_ARTIFACT_CACHE_DIR = os.getenv("MODEL_ARTIFACT_CACHE_DIR", "src/models/.artifact_cache")
+MODEL_ARTIFACT_CACHE_KEEP = int(os.getenv("MODEL_ARTIFACT_CACHE_KEEP", "3"))
+
+# Hot reload: poll the registry alias / local artifact every N seconds (0 = off)
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+MODEL_WATCH_REGISTRY = os.getenv("MODEL_WATCH_REGISTRY", "true").lower() in ("1", "true", "yes")
+WARMUP_FEATURES_PATH = "src/models/test_features.json"
+
+# Airflow REST API used by /retrain
+AIRFLOW_API_URL = os.getenv("AIRFLOW_API_URL", "http://airflow-webserver:8080/api/v1")
+AIRFLOW_DAG_ID = "dvc_pipeline"
+AIRFLOW_API_TIMEOUT = float(os.getenv("AIRFLOW_API_TIMEOUT", "30"))
+# Seconds a DAG run state is served from memory by /retrain/{run_id}
+RETRAIN_STATUS_TTL = float(os.getenv("RETRAIN_STATUS_TTL", "5"))
+
+# Cache of single-row predictions keyed on (model version, features); 0 = off
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
         return bcrypt.checkpw(
@@ -67,39 +138,397 @@ class DummyModel:
             detail="Prediction service unavailable: Model not loaded. Please train the model first using /retrain endpoint"
         )
 
-def load_model():
+    def predict_proba(self, X):
+        return self.predict(X)
+
+def _to_serving_format(model, version: str):
+    if MODEL_FORMAT != "flat":
+        return model
+    if not MODEL_MMAP:
+        return FlatForest.from_sklearn(model)
+
+    # Flatten once per version into a bundle on disk that every worker maps
+    bundle = os.path.join(FLAT_CACHE_DIR, version)
+    meta = os.path.join(bundle, "meta.json")
+    if os.path.exists(meta):
+        # Recently used bundles are the last to be pruned
+        os.utime(meta)
+    else:
+        tmp_bundle = f"{bundle}.{os.getpid()}.tmp"
+        FlatForest.from_sklearn(model).save(tmp_bundle)
+        try:
+            os.replace(tmp_bundle, bundle)
+        except OSError:
+            # Another worker published the same version first
+            shutil.rmtree(tmp_bundle, ignore_errors=True)
+        _prune_flat_cache(keep_version=version)
+    return FlatForest.load(bundle, mmap_mode="r")
+
+def _prune_flat_cache(keep_version: str):
+    """Drop all but the FLAT_CACHE_KEEP most recently used bundles, never
+    the one being loaded or the one being served"""
+    if FLAT_CACHE_KEEP <= 0:
+        return
+    used = {}
+    for name in os.listdir(FLAT_CACHE_DIR):
+        if name.endswith(".tmp"):
+            # Still being written by a worker
+            continue
+        try:
+            used[name] = os.stat(os.path.join(FLAT_CACHE_DIR, name, "meta.json")).st_mtime
+        except OSError:
+            continue
+    current = model_store.current
+    protected = {keep_version, current.version if current is not None else None}
+    for name in sorted(used, key=used.get, reverse=True)[FLAT_CACHE_KEEP:]:
+        if name not in protected:
+            # Workers still mapping it keep their pages until they unmap them
+            shutil.rmtree(os.path.join(FLAT_CACHE_DIR, name), ignore_errors=True)
+            logger.info(f"Flat forest bundle evicted: {name}")
+
+artifact_cache = ArtifactCache(MODEL_ARTIFACT_CACHE_DIR, keep=MODEL_ARTIFACT_CACHE_KEEP)
+
+def _registry_model_version():
+    client = _mlflow().tracking.MlflowClient()
+    return client.get_model_version_by_alias(REGISTRY_MODEL_NAME, REGISTRY_ALIAS)
+
+def _registry_version() -> str:
+    return _registry_model_version().version
+
+def _cached_registry_artifacts(model_version) -> str:
+    """Local directory of a registered model version's artifacts, downloaded on first use"""
+    identity = {
+        "name": model_version.name,
+        "version": str(model_version.version),
+        "run_id": model_version.run_id,
+        "source": model_version.source
+    }
+
+    def download(directory: str) -> str:
+        return _mlflow().artifacts.download_artifacts(artifact_uri=model_version.source, dst_path=directory)
+
+    return artifact_cache.fetch(ArtifactCache.key(**identity), download, **identity)
+
+def _local_version(path: str) -> str:
+    return f"local-{os.stat(path).st_mtime_ns}"
+
+def _flat_meta_path() -> str:
+    return os.path.join(FLAT_MODEL_PATH, "meta.json")
+
+def probe_model_version():
+    """Version load_model() would pick up right now, without loading it.
+
+    None means "no change": a failed registry lookup while the registry's
+    model is served must not swap in the local artifact until it recovers.
+    """
+    if MODEL_WATCH_REGISTRY:
+        try:
+            return f"registry-v{_registry_version()}"
+        except Exception as e:
+            logger.warning(f"Registry version probe failed: {str(e)}")
+            current = model_store.current
+            if current is not None and current.source == "mlflow":
+                return None
+    if MODEL_FORMAT == "flat" and os.path.exists(_flat_meta_path()):
+        return _local_version(_flat_meta_path())
+    if os.path.exists(LOCAL_MODEL_PATH):
+        return _local_version(LOCAL_MODEL_PATH)
+    return None
+
+def load_registry_model() -> Optional[LoadedModel]:
+    """The registry's champion, or None if the registry can't provide it"""
     try:
-        mlflow_model = mlflow.pyfunc.load_model("models:/Accidents_RF_Model@champion")
+        model_version = _registry_model_version()
+        version = model_version.version
+        mlflow_model = _mlflow().pyfunc.load_model(_cached_registry_artifacts(model_version))
         logger.info("MLflow model loaded successfully")
-        return mlflow_model._model_impl.python_model.model
+        return LoadedModel(
+            _to_serving_format(mlflow_model._model_impl.python_model.model, f"registry-v{version}"),
+            version=f"registry-v{version}",
+            source="mlflow"
+        )
     except Exception as e:
         logger.error(f"MLflow load failed: {str(e)}")
+        return None
+
+def load_local_model() -> Optional[LoadedModel]:
+    """The local prod artifact (flat forest or joblib), or None if there is none"""
+    if MODEL_FORMAT == "flat":
+        try:
+            version = _local_version(_flat_meta_path())
+            model = FlatForest.load(FLAT_MODEL_PATH, mmap_mode="r" if MODEL_MMAP else None)
+            logger.info("Local flat forest loaded successfully")
+            return LoadedModel(model, version=version, source=FLAT_MODEL_PATH)
+        except Exception as e:
+            logger.error(f"Local flat forest load failed: {str(e)}")
 
     try:
-        model = joblib.load("src/models/prod_model.joblib")
+        version = _local_version(LOCAL_MODEL_PATH)
+        model = joblib.load(LOCAL_MODEL_PATH)
         logger.info("Local model loaded successfully")
-        return model
+        return LoadedModel(_to_serving_format(model, version), version=version, source=LOCAL_MODEL_PATH)
     except Exception as e:
         logger.error(f"Local model load failed: {str(e)}")
+        return None
 
+def dummy_model() -> LoadedModel:
     logger.error("No model available - using dummy fallback")
-    return DummyModel()
+    return LoadedModel(DummyModel(), version="none", source="dummy")
 
+def load_model() -> LoadedModel:
+    return load_registry_model() or load_local_model() or dummy_model()
+
+
+model_store = ModelStore(
+    load_model,
+    probe_model_version,
+    warmup_features=load_warmup_features(WARMUP_FEATURES_PATH),
+    poll_interval=MODEL_RELOAD_INTERVAL
+)
 
-try:
-    model = load_model()
-except Exception as e:
-    logger.critical(f"Failed to load model: {str(e)}")
-    model = None
-    
 
 class PredictionRequest(BaseModel):
     features: List[float]
 
 
+class NamedPredictionRequest(BaseModel):
+    """Features keyed by name, as in src/models/test_features.json"""
+    features: Dict[str, float]
+
+
+def _active_model() -> LoadedModel:
+    loaded = model_store.current
+    if loaded is None:
+        raise HTTPException(status_code=503, detail="Model is loading, retry shortly")
+    if loaded.compiled is None:
+        # DummyModel fallback: raises its 503
+        loaded.model.predict(None)
+    return loaded
+
+
+def _predict_many(items: List[Tuple[LoadedModel, Features]]) -> List:
+    """Predict queued (model snapshot, row) pairs, once per snapshot.
+
+    Each row is scored by the snapshot its request started with (and cached
+    under), even if a reload swapped the active model while it was queued.
+    """
+    groups: Dict[int, List[int]] = {}
+    for i, (loaded, _) in enumerate(items):
+        groups.setdefault(id(loaded), []).append(i)
+
+    predictions = [None] * len(items)
+    batch_rows.observe(len(items), "microbatch")
+    for indices in groups.values():
+        loaded = items[indices[0]][0]
+        X = np.empty((len(indices), loaded.compiled.n_features), dtype=np.float32)
+        for row, i in enumerate(indices):
+            loaded.compiled.encode(items[i][1], out=X[row])
+        with inference_seconds.time("microbatch"):
+            for i, prediction in zip(indices, loaded.model.predict(X)):
+                predictions[i] = prediction
+    return predictions
+
+
+def _predict_one(loaded: LoadedModel, features: Features):
+    with inference_seconds.time("single"):
+        return loaded.compiled.predict_one(features)
+
+
+async def _predict_single(features: Features):
+    """Score one row via the cache, the micro-batcher or the compiled fast path."""
+    loaded = _active_model()
+    set_request_fields(model_version=loaded.version)
+    # Also rejects malformed rows before they can fail a whole micro-batch
+    with validation_seconds.time("single"):
+        row = loaded.compiled.encode(features)
+
+    cache_key = None
+    if prediction_cache is not None:
+        cache_key = prediction_cache.make_key(loaded.version, row)
+        cached = prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if micro_batcher is not None:
+        prediction = await micro_batcher.submit((loaded, features))
+    else:
+        # The forest is CPU-bound: keep it off the event loop
+        prediction = await run_in_threadpool(_predict_one, loaded, features)
+
+    if cache_key is not None:
+        prediction_cache.put(cache_key, prediction)
+    return prediction
+
+
+prediction_cache = PredictionCache(
+    max_size=PREDICTION_CACHE_SIZE,
+    ttl=PREDICTION_CACHE_TTL
+) if PREDICTION_CACHE_SIZE > 0 else None
+
+
+micro_batcher = MicroBatcher(
+    _predict_many,
+    max_batch_size=MICROBATCH_MAX_SIZE,
+    max_wait_ms=MICROBATCH_MAX_WAIT_MS
+) if MICROBATCH_ENABLED else None
+
+
+prediction_capture = PredictionCapture(
+    PREDICTION_CAPTURE_PATH,
+    max_bytes=int(PREDICTION_CAPTURE_MAX_MB * 2**20),
+    backup_count=PREDICTION_CAPTURE_BACKUPS,
+    sample_rate=PREDICTION_CAPTURE_SAMPLE_RATE
+) if PREDICTION_CAPTURE_PATH else None
+
+dag_trigger = DagTrigger(
+    AIRFLOW_API_URL,
+    AIRFLOW_DAG_ID,
+    auth=(os.getenv("AIRFLOW_API_USER"), os.getenv("AIRFLOW_API_PASS")),
+    timeout=AIRFLOW_API_TIMEOUT,
+    status_ttl=RETRAIN_STATUS_TTL
+)
+
+
+def _model_info_metric() -> dict:
+    loaded = model_store.current
+    return {(loaded.version, loaded.source): 1} if loaded is not None else {}
+
+
+def _model_loaded_at_metric() -> dict:
+    loaded = model_store.current
+    return {(): loaded.loaded_at} if loaded is not None else {}
+
+
+def _cache_metric(key: str):
+    def sample() -> dict:
+        return {(): prediction_cache.stats()[key]} if prediction_cache is not None else {}
+    return sample
+
+
+def _queue_depth_metric() -> dict:
+    return {(): micro_batcher.queue_size} if micro_batcher is not None else {}
+
+
+def _dropped_log_records_metric() -> dict:
+    dropped = {}
+    if log_writer is not None:
+        dropped[("log",)] = log_writer.dropped
+    if prediction_capture is not None:
+        dropped[("capture",)] = prediction_capture.writer.dropped
+    return dropped
+
+
+# In-process Prometheus metrics, served on /metrics. Recording is a few
+# in-memory increments; model and cache state are read at scrape time.
+metrics = MetricsRegistry()
+http_requests = metrics.counter(
+    "api_http_requests_total", "HTTP requests by route and status code", ("method", "route", "status"))
+http_request_seconds = metrics.histogram(
+    "api_http_request_duration_seconds", "End-to-end request latency", ("method", "route"))
+http_in_flight = metrics.gauge("api_http_requests_in_flight", "Requests currently being served")
+inference_seconds = metrics.histogram(
+    "api_model_inference_seconds", "Time spent in the model's predict calls", ("path",))
+validation_seconds = metrics.histogram(
+    "api_request_validation_seconds", "Parsing and validating feature rows", ("path",))
+serialization_seconds = metrics.histogram(
+    "api_response_serialization_seconds", "Building the response body from predictions", ("path",))
+batch_rows = metrics.histogram(
+    "api_prediction_batch_rows", "Rows scored per model call", ("path",), buckets=BATCH_SIZE_BUCKETS)
+metrics.gauge("api_model_info", "Model being served", ("version", "source"), function=_model_info_metric)
+metrics.gauge("api_model_loaded_timestamp_seconds", "When the served model was loaded",
+              function=_model_loaded_at_metric)
+metrics.gauge("api_prediction_cache_entries", "Entries in the prediction cache", function=_cache_metric("size"))
+metrics.counter("api_prediction_cache_hits_total", "Prediction cache hits", function=_cache_metric("hits"))
+metrics.counter("api_prediction_cache_misses_total", "Prediction cache misses", function=_cache_metric("misses"))
+metrics.counter("api_prediction_cache_evictions_total", "Prediction cache LRU evictions",
+                function=_cache_metric("evictions"))
+metrics.counter("api_prediction_cache_expirations_total", "Prediction cache TTL expirations",
+                function=_cache_metric("expirations"))
+metrics.gauge("api_microbatch_queue_depth", "Rows waiting for the micro-batcher", function=_queue_depth_metric)
+metrics.counter("api_log_records_dropped_total", "Records dropped because the log writer fell behind",
+                ("sink",), function=_dropped_log_records_metric)
+
+app.add_middleware(
+    RequestLogMiddleware,
+    logger=logging.getLogger("api.requests"),
+    sample_rate=REQUEST_LOG_SAMPLE_RATE,
+    sampled_routes=PREDICTION_ROUTES,
+    model_version=lambda: model_store.current.version if model_store.current else None,
+    probe_routes=("/", "/ready")
+)
+app.add_middleware(
+    MetricsMiddleware,
+    requests_total=http_requests,
+    request_seconds=http_request_seconds,
+    in_flight=http_in_flight
+)
+
+
+@app.on_event("startup")
+async def start_micro_batcher():
+    if micro_batcher is not None:
+        await micro_batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_micro_batcher():
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+
+
+@app.on_event("startup")
+def start_model_loading():
+    # Serve health checks right away: the local artifact is served as soon as
+    # it is loaded, the registry's champion replaces it when it arrives
+    model_store.load_in_background(load_local_model, load_registry_model, dummy_model)
+
+
+@app.on_event("startup")
+def start_model_watcher():
+    model_store.start_watcher()
+
+
+@app.on_event("startup")
+def load_auth_settings():
+    # JWT key material is read once, not per request
+    jwt_settings()
+
+
+@app.on_event("shutdown")
+def stop_model_watcher():
+    model_store.stop_watcher()
+
+
+@app.on_event("shutdown")
+async def close_airflow_client():
+    await dag_trigger.aclose()
+
+
+@app.on_event("shutdown")
+def flush_prediction_capture():
+    if prediction_capture is not None:
+        prediction_capture.writer.stop()
+
+
 @app.get("/")
 def read_root():
-    return {"status": "API is working", "model_loaded": model is not None}
+    """Liveness: answers as soon as the process serves requests"""
+    return {"status": "API is working", "model_loaded": model_store.current is not None}
+
+
+@app.get("/ready")
+def readiness():
+    """Readiness: 503 until the first model load settled"""
+    loaded = model_store.current
+    if not model_store.ready.is_set() or loaded is None:
+        return JSONResponse({"ready": False, "status": "loading model"}, status_code=503)
+    return {"ready": True, "model_version": loaded.version, "model_source": loaded.source}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Request, inference, model and cache metrics in Prometheus text format"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
 
 
 @app.post("/auth/token", response_model=Token)
@@ -119,7 +548,8 @@ async def login(
         logger.warning(f"Invalid username attempt: {username}")
         raise HTTPException(status_code=400, detail="Wrong login/password")
 
-    if not verify_password(password, admin_hash):
+    # bcrypt is deliberately slow: keep it off the event loop serving predictions
+    if not await run_in_threadpool(verify_password, password, admin_hash):
         logger.warning(f"Invalid password attempt for user: {username}")
         raise HTTPException(status_code=400, detail="Wrong login/password")
     
@@ -133,69 +563,191 @@ async def predict(
     user: dict = Depends(get_admin_user)
 ):
     """Make prediction (Admin only)"""
-    if not model:
-        raise HTTPException(status_code=500, detail="Model not loaded")
-    
     try:
-        features_df = pd.DataFrame(
-            [request.features],
-            columns=model.feature_names_in_
-        )
-        prediction = model.predict(features_df)
-        return {"prediction": int(prediction[0])}
+        prediction = await _predict_single(request.features)
+        if prediction_capture is not None:
+            prediction_capture.record("/predict", features=request.features, prediction=int(prediction))
+        return {"prediction": int(prediction)}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         raise HTTPException(400, detail=str(e))
 
 
-@app.post("/retrain")
-async def retrain(user: dict = Depends(get_admin_user)):
+@app.post("/predict/named")
+async def predict_named(
+    request: NamedPredictionRequest,
+    user: dict = Depends(get_admin_user)
+):
+    """Make prediction from name-keyed features (Admin only)"""
+    try:
+        prediction = await _predict_single(request.features)
+        if prediction_capture is not None:
+            prediction_capture.record("/predict/named", features=request.features, prediction=int(prediction))
+        return {"prediction": int(prediction)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Prediction error: {str(e)}")
+        raise HTTPException(400, detail=str(e))
+
+
+def _parse_batch_rows(body: bytes, content_type: str, n_features: int) -> np.ndarray:
+    """Parse a JSON list or NDJSON body into one (n_rows, n_features) array.
+
+    Each row is either a plain list of floats or an object shaped like
+    PredictionRequest ({"features": [...]}).
     """
-    Starts DAG dvc_pipeline в Airflow and returns the status
+    try:
+        if "ndjson" in content_type or "jsonl" in content_type:
+            rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            rows = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Malformed batch body: {str(e)}")
+
+    if not isinstance(rows, list) or not rows:
+        raise HTTPException(status_code=422, detail="Batch body must be a non-empty list of rows")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(rows)} rows (max {MAX_BATCH_ROWS})"
+        )
+
+    try:
+        rows = [row["features"] if isinstance(row, dict) else row for row in rows]
+        X = np.asarray(rows, dtype=np.float64)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid batch rows: missing key {str(e)}")
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid batch rows: {str(e)}")
+
+    if X.ndim != 2 or X.shape[1] != n_features:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Every row must contain exactly {n_features} numeric features"
+        )
+    if not np.isfinite(X).all():
+        raise HTTPException(status_code=422, detail="Features must be finite numbers")
+    return X
+
+
+@app.post("/predict/batch")
+async def predict_batch(
+    request: Request,
+    user: dict = Depends(get_admin_user)
+):
+    """Make predictions for many rows in one call (Admin only).
+
+    Accepts a JSON list of rows or an NDJSON body (Content-Type:
+    application/x-ndjson) with one row per line. All rows go through a
+    single predict_proba call.
     """
-    def trigger_dag():
-        try:
-            airflow_url = "http://airflow-webserver:8080/api/v1/dags/dvc_pipeline/dagRuns"
-            auth = (
-                os.getenv("AIRFLOW_API_USER"), 
-                os.getenv("AIRFLOW_API_PASS")
-                )
-            
-            response = requests.post(
-                airflow_url,
-                json={
-                    "dag_run_id": f"manual_run_{int(time.time())}",
-                    "conf": {}
-                },
-                auth=auth,
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Airflow API error: {str(e)}")
-            raise
+    loaded = _active_model()
+    set_request_fields(model_version=loaded.version)
+    body = await request.body()
+    with validation_seconds.time("batch"):
+        X = _parse_batch_rows(body, request.headers.get("content-type", ""), loaded.compiled.n_features)
+    batch_rows.observe(X.shape[0], "batch")
+
+    def predict_proba(X):
+        with inference_seconds.time("batch"):
+            return loaded.model.predict_proba(X)
 
     try:
-        result = trigger_dag()
-        return {
-            "status": "success",
-            "dag_run_id": result.get("dag_run_id"),
-            "airflow_response": result
-        }
+        proba = await run_in_threadpool(predict_proba, X)
     except Exception as e:
-        logger.exception("Failed to trigger DAG")
-        raise HTTPException(500, detail=str(e))
+        logger.error(f"Batch prediction error: {str(e)}")
+        raise HTTPException(400, detail=str(e))
 
+    # Same decision rule as RandomForestClassifier.predict, without a second pass
+    predictions = loaded.model.classes_.take(np.argmax(proba, axis=1))
+    if prediction_capture is not None:
+        # Arrays are only encoded by the capture's writer thread
+        prediction_capture.record("/predict/batch", features=X, predictions=predictions,
+                                  probabilities=proba[:, -1])
+    with serialization_seconds.time("batch"):
+        return JSONResponse({
+            "count": int(X.shape[0]),
+            "predictions": predictions.astype(int).tolist(),
+            # Probability of the prioritary class (grav == 1)
+            "probabilities": proba[:, -1].tolist()
+        })
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
+
+@app.get("/admin/model")
+async def model_info(user: dict = Depends(get_admin_user)):
+    """Report the model currently being served (Admin only)"""
+    loaded = model_store.current
+    if loaded is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    return loaded.info()
+
+
+@app.post("/admin/reload")
+async def reload_model(user: dict = Depends(get_admin_user)):
+    """Load the latest model and swap it in without a restart (Admin only)"""
+    previous = model_store.current
     try:
-        response = await call_next(request)
-        logger.info(f"Response: {response.status_code}")
-        return response
+        loaded = await run_in_threadpool(model_store.reload)
     except Exception as e:
-        logger.error(f"Error: {str(e)}")
-        raise
\ No newline at end of file
+        logger.exception("Model reload failed")
+        raise HTTPException(500, detail=str(e))
+    return {
+        "previous_version": previous.version if previous else None,
+        **loaded.info()
+    }
+
+
+@app.get("/admin/cache")
+async def cache_stats(user: dict = Depends(get_admin_user)):
+    """Prediction cache size and hit/miss counters (Admin only)"""
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+
+@app.delete("/admin/cache")
+async def clear_cache(user: dict = Depends(get_admin_user)):
+    """Drop all cached predictions (Admin only)"""
+    if prediction_cache is not None:
+        prediction_cache.clear()
+    return {"status": "cleared"}
+
+
+@app.post("/retrain")
+async def retrain(user: dict = Depends(get_admin_user)):
+    """
+    Starts DAG dvc_pipeline в Airflow and returns the status.
+    While a run of the DAG is queued or running, returns that run instead
+    """
+    try:
+        result, started = await dag_trigger.trigger()
+    except AirflowError as e:
+        logger.error(f"Failed to trigger DAG: {str(e)}")
+        raise HTTPException(502, detail=str(e))
+    return {
+        "status": "success" if started else "already_running",
+        "dag_run_id": result.get("dag_run_id"),
+        "airflow_response": result
+    }
+
+
+@app.get("/retrain/{run_id}")
+async def retrain_status(run_id: str, user: dict = Depends(get_admin_user)):
+    """State of a dvc_pipeline DAG run (cached for RETRAIN_STATUS_TTL seconds)"""
+    try:
+        result = await dag_trigger.status(run_id)
+    except AirflowError as e:
+        if e.status_code == 404:
+            raise HTTPException(404, detail=f"DAG run {run_id} not found")
+        logger.error(f"Failed to get DAG run {run_id}: {str(e)}")
+        raise HTTPException(502, detail=str(e))
+    return {
+        "dag_run_id": result.get("dag_run_id", run_id),
+        "state": result.get("state"),
+        "start_date": result.get("start_date"),
+        "end_date": result.get("end_date"),
+        "airflow_response": result
+    }
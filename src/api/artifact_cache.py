@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+class ArtifactCache:
+    """Content-addressed directory of downloaded model artifacts.
+
+    Each entry lives under ``root/<digest>``, the digest being taken from the
+    identity of what was downloaded (registered model, version, run id and
+    artifact source): registry artifacts never change once registered, so an
+    entry, once complete, is valid forever. Entries are published with an
+    atomic rename, so concurrent workers never see a half-written one.
+    """
+
+    def __init__(self, root: str, keep: int = 3):
+        self.root = root
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(**identity) -> str:
+        canonical = json.dumps(identity, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[str]:
+        """Local path of a complete entry, or None"""
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, MANIFEST)) as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+        path = os.path.normpath(os.path.join(entry, manifest["path"]))
+        if not os.path.exists(path):
+            return None
+        # Recently used entries are the last to be pruned
+        os.utime(os.path.join(entry, MANIFEST))
+        return path
+
+    def fetch(self, key: str, download: Callable[[str], str], **identity) -> str:
+        """Local path of the entry, calling ``download(directory)`` on a miss.
+
+        ``download`` fills the (empty) directory and returns the path of the
+        artifact it downloaded, which may be the directory itself or a path
+        inside it.
+        """
+        path = self.get(key)
+        if path is not None:
+            logger.info(f"Model artifacts found in cache: {key[:12]}")
+            return path
+
+        os.makedirs(self.root, exist_ok=True)
+        entry = self._entry(key)
+        tmp_entry = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        os.makedirs(tmp_entry)
+        started = time.perf_counter()
+        try:
+            downloaded = download(tmp_entry)
+            # Some artifact stores "download" a missing path as an empty directory
+            if not os.path.exists(downloaded) or (os.path.isdir(downloaded) and not os.listdir(downloaded)):
+                raise FileNotFoundError(f"No artifacts downloaded for {identity or key}")
+            manifest = {"path": os.path.relpath(downloaded, tmp_entry), "cached_at": time.time(), **identity}
+            with open(os.path.join(tmp_entry, MANIFEST), "w") as file:
+                json.dump(manifest, file, default=str)
+            os.replace(tmp_entry, entry)
+        except OSError:
+            if self.get(key) is None:
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+                raise
+            # Another worker published the same entry first
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            raise
+        logger.info(f"Model artifacts downloaded to cache in {time.perf_counter() - started:.1f}s: {key[:12]}")
+        self.prune(exclude=key)
+        return self.get(key) or os.path.join(entry, manifest["path"])
+
+    def entries(self) -> List[str]:
+        """Keys of complete entries, most recently used first"""
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        used = {}
+        for name in names:
+            try:
+                used[name] = os.stat(os.path.join(self.root, name, MANIFEST)).st_mtime
+            except OSError:
+                continue
+        return sorted(used, key=used.get, reverse=True)
+
+    def prune(self, exclude: Optional[str] = None):
+        """Drop all but the ``keep`` most recently used entries"""
+        if self.keep <= 0:
+            return
+        with self._lock:
+            for key in self.entries()[self.keep:]:
+                if key != exclude:
+                    shutil.rmtree(self._entry(key), ignore_errors=True)
+                    logger.info(f"Model artifacts evicted from cache: {key[:12]}")
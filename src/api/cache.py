@@ -0,0 +1,38 @@
+import hashlib
+from typing import Tuple
+
+import numpy as np
+
+from src.utils.lru import LRUCache
+
+
+class PredictionCache(LRUCache):
+    """Thread-safe LRU cache with a TTL for single-row predictions.
+
+    Keys combine the model version with a digest of the encoded feature row,
+    so entries of a replaced model are never served and simply age out.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        super().__init__(max_size, ttl=ttl)
+
+    @staticmethod
+    def make_key(version: str, row: np.ndarray) -> Tuple[str, bytes]:
+        """Key for a row already encoded in the model's feature order."""
+        # + 0.0 folds -0.0 into 0.0 so both hash the same
+        canonical = np.ascontiguousarray(row, dtype=np.float32) + np.float32(0.0)
+        return version, hashlib.blake2b(canonical.tobytes(), digest_size=16).digest()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
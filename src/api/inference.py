@@ -0,0 +1,62 @@
+import threading
+from typing import Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+Features = Union[Sequence[float], Mapping[str, float]]
+
+
+class CompiledModel:
+    """Pandas-free single-row inference path for a fitted model.
+
+    Built once when the model is loaded: the feature order comes from
+    ``feature_names_in_`` and each worker thread gets its own preallocated
+    float32 row buffer (the dtype the forest compares against anyway), so a
+    request only costs copying its values into place before ``predict``.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.feature_names = [str(name) for name in model.feature_names_in_]
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        self.n_features = len(self.feature_names)
+        self._local = threading.local()
+
+    @classmethod
+    def from_model(cls, model) -> Optional["CompiledModel"]:
+        """Compile ``model``, or return None if it carries no feature names."""
+        if not hasattr(model, "feature_names_in_"):
+            return None
+        return cls(model)
+
+    def _buffer(self) -> np.ndarray:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, self.n_features), dtype=np.float32)
+        return buffer
+
+    def encode(self, features: Features, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Write one row of positional or named features into ``out``."""
+        if out is None:
+            out = np.empty(self.n_features, dtype=np.float32)
+
+        if isinstance(features, Mapping):
+            if len(features) != self.n_features or not all(
+                name in self.feature_index for name in features
+            ):
+                missing = sorted(set(self.feature_names) - set(features))
+                unknown = sorted(set(features) - set(self.feature_names))
+                raise ValueError(f"Feature mismatch: missing={missing}, unknown={unknown}")
+            for name, value in features.items():
+                out[self.feature_index[name]] = value
+        else:
+            if len(features) != self.n_features:
+                raise ValueError(f"Expected {self.n_features} features, got {len(features)}")
+            out[:] = features
+        return out
+
+    def predict_one(self, features: Features):
+        """Predict a single row through this thread's preallocated buffer."""
+        buffer = self._buffer()
+        self.encode(features, out=buffer[0])
+        return self.model.predict(buffer)[0]
@@ -0,0 +1,209 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from src.api.inference import CompiledModel
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel:
+    """Immutable snapshot of a served model.
+
+    Handlers grab ``ModelStore.current`` once and use that snapshot for the
+    whole request, so a concurrent swap never mixes two models (or a model
+    with another model's feature layout) inside one prediction.
+    """
+
+    def __init__(self, model, version: str, source: str):
+        self.model = model
+        self.version = version
+        self.source = source
+        self.compiled = CompiledModel.from_model(model)
+        self.loaded_at = time.time()
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "model_type": type(self.model).__name__,
+            "n_features": self.compiled.n_features if self.compiled else None,
+            "loaded_at": self.loaded_at
+        }
+
+
+class ModelStore:
+    """Holds the active model and swaps in new ones off the request path.
+
+    ``loader`` builds a fresh LoadedModel, ``probe`` cheaply returns the
+    version that ``loader`` would load right now (file mtime, registry alias).
+    A background thread polls ``probe`` and reloads when it changes; new
+    models are warmed with ``warmup_features`` before the reference swap.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], LoadedModel],
+        probe: Callable[[], Optional[str]],
+        warmup_features: Optional[dict] = None,
+        poll_interval: float = 30.0
+    ):
+        self.loader = loader
+        self.probe = probe
+        self.warmup_features = warmup_features
+        self.poll_interval = poll_interval
+        self._current: Optional[LoadedModel] = None
+        self._last_seen: Optional[str] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._initial_load: Optional[threading.Thread] = None
+        # Set once the first load settled: a model is served, or none could be found
+        self.ready = threading.Event()
+
+    @property
+    def current(self) -> Optional[LoadedModel]:
+        return self._current
+
+    def _warm_up(self, loaded: LoadedModel):
+        if self.warmup_features is None or loaded.compiled is None:
+            return
+        loaded.compiled.predict_one(self.warmup_features)
+        row = loaded.compiled.encode(self.warmup_features)
+        loaded.model.predict_proba(row[np.newaxis, :])
+
+    def reload(self, probed_version: Optional[str] = None) -> LoadedModel:
+        """Load, warm up and atomically activate the latest model.
+
+        If loading or warm-up fails the previous model keeps serving.
+        """
+        with self._reload_lock:
+            loaded = self.loader()
+            self._activate(loaded, probed_version)
+            self.ready.set()
+            return loaded
+
+    def activate(self, loaded: LoadedModel, replace: bool = True) -> bool:
+        """Warm up and serve an already loaded model.
+
+        With replace=False, only if no model is served yet. Returns whether
+        the model was activated.
+        """
+        with self._reload_lock:
+            if not replace and self._current is not None:
+                return False
+            self._activate(loaded)
+            return True
+
+    def _activate(self, loaded: LoadedModel, probed_version: Optional[str] = None):
+        try:
+            self._warm_up(loaded)
+        except Exception as e:
+            logger.error(f"Warm-up of model {loaded.version} failed: {str(e)}")
+            if self._current is not None:
+                raise
+        previous = self._current
+        if probed_version is None:
+            self._last_seen = loaded.version
+        # A single reference assignment: readers see the old or the new
+        # snapshot, never a half-built one
+        self._current = loaded
+        logger.info(
+            f"Active model: {loaded.version} ({loaded.source})"
+            + (f", replaced {previous.version}" if previous else "")
+        )
+
+    def load_in_background(
+        self,
+        local: Callable[[], Optional[LoadedModel]],
+        remote: Callable[[], Optional[LoadedModel]],
+        placeholder: Callable[[], LoadedModel]
+    ):
+        """First model load, off the startup path.
+
+        ``local`` (a file on disk: fast) and ``remote`` (the registry: slow,
+        may have to time out) run in parallel. The local model is served as
+        soon as it is loaded, and the remote one replaces it when it arrives,
+        as ``loader`` would have preferred it. Either returns None when it has
+        no model. ``placeholder`` is served if neither does.
+        """
+        if self._initial_load is not None:
+            return
+
+        def load(source: str, fn, replace: bool):
+            try:
+                loaded = fn()
+                if loaded is not None and self.activate(loaded, replace=replace):
+                    self.ready.set()
+            except Exception as e:
+                logger.error(f"Initial {source} model load failed: {str(e)}")
+
+        def run():
+            remote_load = threading.Thread(target=load, args=("remote", remote, True),
+                                           name="model-load-remote", daemon=True)
+            remote_load.start()
+            load("local", local, False)
+            remote_load.join()
+            if self._current is None:
+                self.activate(placeholder(), replace=False)
+            self.ready.set()
+
+        self._initial_load = threading.Thread(target=run, name="model-load", daemon=True)
+        self._initial_load.start()
+
+    def check_for_update(self) -> bool:
+        """Reload if the probed version changed since the last check.
+
+        Each new probe result triggers at most one reload, so a version the
+        loader can't actually fetch (e.g. a broken registry artifact) doesn't
+        cause a reload on every poll.
+        """
+        try:
+            version = self.probe()
+        except Exception as e:
+            logger.warning(f"Model version probe failed: {str(e)}")
+            return False
+        if version is None or version == self._last_seen:
+            return False
+        self._last_seen = version
+        logger.info(f"New model version detected: {version}")
+        self.reload(probed_version=version)
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            if self._initial_load is not None and not self.ready.is_set():
+                # The initial load is still running: don't load the same model twice
+                continue
+            try:
+                self.check_for_update()
+            except Exception as e:
+                logger.error(f"Model reload failed: {str(e)}")
+
+    def start_watcher(self):
+        if self.poll_interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"Model watcher started (every {self.poll_interval:g}s)")
+
+    def stop_watcher(self):
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join(timeout=self.poll_interval + 1)
+        self._watcher = None
+
+
+def load_warmup_features(path: str) -> Optional[dict]:
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except Exception as e:
+        logger.warning(f"No warm-up sample at {path}: {str(e)}")
+        return None
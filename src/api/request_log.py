@@ -0,0 +1,228 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Fields of the request being served, filled in by handlers (model version)
+# and logged with the request by RequestLogMiddleware
+request_context: ContextVar[Optional[dict]] = ContextVar("request_context", default=None)
+
+
+def set_request_fields(**fields):
+    context = request_context.get()
+    if context is not None:
+        context.update(fields)
+
+
+def _to_json(value):
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; structured fields come from extra={"fields": {...}}"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=_to_json)
+
+
+class _NdjsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.fields, default=_to_json)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the writer thread as they are, and drops them when it
+    falls behind rather than blocking the caller."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is the writer's job; only the traceback must be rendered
+        # while it still exists
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class QueuedLogWriter:
+    """A bounded queue drained into ``handlers`` by a background thread."""
+
+    def __init__(self, handlers: Iterable[logging.Handler], max_queue: int = 10000):
+        self.handler = _NonBlockingQueueHandler(queue.Queue(max_queue))
+        self._listener = QueueListener(self.handler.queue, *handlers, respect_handler_level=True)
+        self._running = False
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def start(self):
+        if not self._running:
+            self._listener.start()
+            self._running = True
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Write out what is queued and stop the thread"""
+        if self._running:
+            self._running = False
+            self._listener.stop()
+
+
+def setup_logging(log_file: str, level: int = logging.INFO, max_queue: int = 10000) -> Optional[QueuedLogWriter]:
+    """Route the root logger through a QueuedLogWriter writing JSON to stderr and log_file.
+
+    Like logging.basicConfig, does nothing (and returns None) when the root
+    logger is already configured.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    formatter = JsonFormatter()
+    handlers: List[logging.Handler] = [logging.StreamHandler(), logging.FileHandler(log_file)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    writer = QueuedLogWriter(handlers, max_queue)
+    root.addHandler(writer.handler)
+    root.setLevel(level)
+    writer.start()
+    return writer
+
+
+class PredictionCapture:
+    """Prediction inputs and outputs appended as NDJSON to a size-rotated file.
+
+    Each record is a dict queued as is; encoding and writing happen in the
+    writer thread, so arrays (batch rows) cost nothing on the request path.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int, sample_rate: float = 1.0,
+                 max_queue: int = 10000):
+        self.sample_rate = sample_rate
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(_NdjsonFormatter())
+        self.writer = QueuedLogWriter([handler], max_queue)
+        self.writer.start()
+
+    def record(self, route: str, **fields):
+        """Queue one prediction (sampled), tagged with the current request id and model version"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        context = request_context.get() or {}
+        self.writer.handler.handle(logging.makeLogRecord({"levelno": logging.INFO, "fields": {
+            "time": time.time(),
+            "request_id": context.get("request_id"),
+            "model_version": context.get("model_version"),
+            "route": route,
+            **fields
+        }}))
+
+
+class RequestLogMiddleware:
+    """Plain ASGI middleware logging one structured record per request.
+
+    The record holds method, route template, status, latency, model version
+    and request id (from the X-Request-ID header, or generated, and echoed in
+    the response). Successful requests to ``sampled_routes`` are only logged
+    with probability ``sample_rate``; errors are always logged.
+
+    Only internal errors (500, or an exception escaping the app) are logged
+    at ERROR; other error statuses are answered on purpose (a 502 from an
+    upstream, a 503 while the model loads) and logged at WARNING. Requests
+    to ``probe_routes`` are logged at INFO whatever their status: a probe
+    answering "not ready" is expected during every startup.
+    """
+
+    def __init__(self, app, logger: logging.Logger, sample_rate: float = 1.0,
+                 sampled_routes: Iterable[str] = (), model_version: Callable[[], Optional[str]] = lambda: None,
+                 probe_routes: Iterable[str] = ()):
+        self.app = app
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.sampled_routes = frozenset(sampled_routes)
+        self.model_version = model_version
+        self.probe_routes = frozenset(probe_routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")[:128]
+                break
+        context = {"request_id": request_id or uuid.uuid4().hex}
+        token = request_context.set(context)
+        status = [500]
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.encode(), context["request_id"].encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception as e:
+            context["error"] = str(e)
+            raise
+        finally:
+            request_context.reset(token)
+            self._log(scope, status[0], time.perf_counter() - started, context)
+
+    def _log(self, scope, status: int, elapsed: float, context: dict):
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        if status < 400 and route in self.sampled_routes and random.random() >= self.sample_rate:
+            return
+        if "model_version" not in context:
+            context["model_version"] = self.model_version()
+        if route in self.probe_routes or status < 400:
+            level = logging.INFO
+        elif status == 500 or "error" in context:
+            level = logging.ERROR
+        else:
+            level = logging.WARNING
+        if not self.logger.isEnabledFor(level):
+            return
+        self.logger.log(level, f"{scope['method']} {route} {status}", extra={"fields": {
+            "method": scope["method"],
+            "route": route,
+            "status": status,
+            "latency_ms": round(elapsed * 1000, 3),
+            **context
+        }})
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# DAG run states after which a run can no longer change
+FINISHED_STATES = frozenset({"success", "failed"})
+# States of a run that has not finished yet
+ACTIVE_STATES = ("queued", "running")
+
+
+class AirflowError(Exception):
+    """The Airflow API failed or answered with an error; status_code is Airflow's (None if unreachable)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DagTrigger:
+    """Triggers and tracks runs of one Airflow DAG through the stable REST API.
+
+    Requests go through a shared httpx.AsyncClient (one connection pool,
+    never blocking the event loop). Before triggering, Airflow is asked for
+    queued or running runs of the DAG, whoever started them (another API
+    worker, the UI, a schedule): if there is one, it is returned instead of
+    starting another, and if Airflow can't tell, nothing is triggered.
+    Concurrent triggers in this process share a single check and request.
+    DAG run states are cached for ``status_ttl`` seconds (for good once
+    finished), so clients polling /retrain/{run_id} don't each reach Airflow.
+    """
+
+    def __init__(self, api_url: str, dag_id: str, auth: Optional[Tuple[str, str]] = None,
+                 timeout: float = 30.0, status_ttl: float = 5.0, max_statuses: int = 256):
+        self.api_url = api_url.rstrip("/")
+        self.dag_id = dag_id
+        self.auth = auth
+        self.timeout = timeout
+        self.status_ttl = status_ttl
+        self.max_statuses = max_statuses
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pending_trigger: Optional[asyncio.Future] = None
+        self._pending_status = {}
+        self._statuses: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    @property
+    def runs_url(self) -> str:
+        return f"{self.api_url}/dags/{self.dag_id}/dagRuns"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                auth=self.auth if self.auth and all(self.auth) else None,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        # Both are bound to the event loop being shut down
+        self._pending_trigger = None
+        self._pending_status.clear()
+
+    async def _request(self, method: str, url: str, **kwargs) -> dict:
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            raise AirflowError(f"Airflow API unreachable: {str(e)}") from e
+        if response.is_error:
+            raise AirflowError(f"Airflow API error {response.status_code}: {response.text[:500]}",
+                               status_code=response.status_code)
+        return response.json()
+
+    async def trigger(self) -> Tuple[dict, bool]:
+        """(DAG run, whether it was started by this call)"""
+        if self._pending_trigger is None or self._pending_trigger.done():
+            self._pending_trigger = asyncio.ensure_future(self._trigger())
+            return await asyncio.shield(self._pending_trigger)
+        # Another request is already triggering: share its run
+        run, _ = await asyncio.shield(self._pending_trigger)
+        return run, False
+
+    async def active_run(self) -> Optional[dict]:
+        """The latest queued or running run of the DAG, or None; raises AirflowError if Airflow can't tell"""
+        runs = await self._request("GET", self.runs_url, params={
+            "state": list(ACTIVE_STATES),
+            "order_by": "-execution_date",
+            "limit": 1
+        })
+        dag_runs = runs.get("dag_runs") or []
+        return dag_runs[0] if dag_runs else None
+
+    async def _trigger(self) -> Tuple[dict, bool]:
+        run = await self.active_run()
+        if run is not None:
+            logger.info(f"DAG run {run.get('dag_run_id')} is still {run.get('state')}, not triggering another")
+            self._remember(run)
+            return run, False
+
+        run = await self._request("POST", self.runs_url, json={
+            # Unique even for two runs triggered within the same second
+            "dag_run_id": f"manual_run_{int(time.time())}_{uuid.uuid4().hex[:8]}",
+            "conf": {}
+        })
+        self._remember(run)
+        logger.info(f"DAG run {run.get('dag_run_id')} triggered")
+        return run, True
+
+    def _remember(self, run: dict):
+        run_id = run.get("dag_run_id")
+        if run_id is None:
+            return
+        self._statuses[run_id] = (time.monotonic(), run)
+        self._statuses.move_to_end(run_id)
+        while len(self._statuses) > self.max_statuses:
+            self._statuses.popitem(last=False)
+
+    async def status(self, run_id: str, max_age: Optional[float] = None) -> dict:
+        """DAG run as returned by Airflow, at most max_age (default status_ttl) seconds old"""
+        max_age = self.status_ttl if max_age is None else max_age
+        entry = self._statuses.get(run_id)
+        if entry is not None:
+            fetched_at, run = entry
+            if run.get("state") in FINISHED_STATES or time.monotonic() - fetched_at < max_age:
+                return run
+
+        pending = self._pending_status.get(run_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._request("GET", f"{self.runs_url}/{quote(run_id, safe='')}"))
+            self._pending_status[run_id] = pending
+            pending.add_done_callback(lambda _: self._pending_status.pop(run_id, None))
+        run = await asyncio.shield(pending)
+        self._remember(run)
+        return run
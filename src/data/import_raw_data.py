@@ -1,45 +1,171 @@
 import requests
 import os
+import re
+import json
+import hashlib
 import logging
-from check_structure import check_existing_file, check_existing_folder
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 
+logger = logging.getLogger(__name__)
 
-def import_raw_data(raw_data_relative_path, 
+# ETag and sha256 of every downloaded file, kept next to the files
+MANIFEST_FILENAME = ".manifest.json"
+CHUNK_SIZE = 1 << 20
+# Small enough that little is lost (and re-requested) when a transfer breaks
+STREAM_CHUNK_SIZE = 64 * 1024
+MAX_ATTEMPTS = 3
+# (connect, read) timeouts in seconds
+TIMEOUT = (10, 60)
+# S3 ETags of single-part uploads are the MD5 of the object
+MD5_ETAG = re.compile(r'^"?([0-9a-f]{32})"?$')
+
+
+class Manifest:
+    """Thread-safe JSON record of what was downloaded, rewritten atomically on change"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    def get(self, filename):
+        with self._lock:
+            return dict(self._entries.get(filename, {}))
+
+    def update(self, filename, **fields):
+        with self._lock:
+            self._entries.setdefault(filename, {}).update(fields)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def _digests(filepath):
+    """(sha256, md5) hex digests of a file"""
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+            md5.update(chunk)
+    return sha256.hexdigest(), md5.hexdigest()
+
+
+def download_file(session, url, output_file, manifest):
+    """Stream url to output_file; returns "unchanged", "downloaded" or "resumed".
+
+    The local copy is kept when its sha256 matches the manifest and the
+    server still reports the same ETag. Interrupted transfers are left in
+    output_file + ".part" and resumed with a Range request (If-Range on the
+    ETag, so a file changed in between is downloaded again from the start).
+    """
+    filename = os.path.basename(output_file)
+    part_file = output_file + ".part"
+    entry = manifest.get(filename)
+    local_ok = (os.path.exists(output_file) and "sha256" in entry
+                and _digests(output_file)[0] == entry["sha256"])
+
+    status = "downloaded"
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        headers = {}
+        offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+        if local_ok and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        elif offset and entry.get("partial_etag"):
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = entry["partial_etag"]
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                if response.status_code == 304:
+                    return "unchanged"
+                if response.status_code == 416:
+                    # The partial file is not a prefix of the current object
+                    os.remove(part_file)
+                    continue
+                response.raise_for_status()
+                etag = response.headers.get("ETag")
+                if local_ok and etag is not None and etag == entry.get("etag"):
+                    return "unchanged"
+                if response.status_code == 206:
+                    status = "resumed"
+                    mode = "ab"
+                else:
+                    mode = "wb"
+                manifest.update(filename, partial_etag=etag)
+                entry["partial_etag"] = etag
+                with open(part_file, mode) as f:
+                    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                        f.write(chunk)
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            logger.warning(f'{filename}: attempt {attempt} failed ({e}), resuming')
+    else:
+        raise RuntimeError(f'{filename}: no usable response after {MAX_ATTEMPTS} attempts')
+
+    sha256, md5 = _digests(part_file)
+    expected_md5 = MD5_ETAG.match(etag or "")
+    if expected_md5 and expected_md5.group(1) != md5:
+        os.remove(part_file)
+        raise RuntimeError(f'{filename}: MD5 {md5} does not match ETag {etag}')
+    os.replace(part_file, output_file)
+    manifest.update(filename, etag=etag, sha256=sha256, size=os.path.getsize(output_file), partial_etag=None)
+    return status
+
+
+def import_raw_data(raw_data_relative_path,
                     filenames,
-                    bucket_folder_url):
+                    bucket_folder_url,
+                    max_workers=4):
     '''import filenames from bucket_folder_url in raw_data_relative_path'''
     os.makedirs(raw_data_relative_path, exist_ok=True)  # Автоматическое создание папки
-    # download all the files
-    for filename in filenames :
-        input_file = os.path.join(bucket_folder_url,filename)
-        output_file = os.path.join(raw_data_relative_path, filename)
-        if check_existing_file(output_file):
-            object_url = input_file
-            print(f'downloading {input_file} as {os.path.basename(output_file)}')
-            response = requests.get(object_url)
-            if response.status_code == 200:
-                # Process the response content as needed
-                content = response.text
-                text_file = open(output_file, "wb")
-                text_file.write(content.encode('utf-8'))
-                text_file.close()
-            else:
-                print(f'Error accessing the object {input_file}:', response.status_code)
-                
-def main(raw_data_relative_path="./data/raw", 
-        filenames = ["caracteristiques-2021.csv", "lieux-2021.csv", "usagers-2021.csv", 
+    manifest = Manifest(os.path.join(raw_data_relative_path, MANIFEST_FILENAME))
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # download all the files, max_workers at a time
+    failed = []
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for filename in filenames:
+            input_file = os.path.join(bucket_folder_url, filename)
+            output_file = os.path.join(raw_data_relative_path, filename)
+            futures[executor.submit(download_file, session, input_file, output_file, manifest)] = filename
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                logger.info(f'{filename}: {future.result()}')
+            except Exception as e:
+                logger.error(f'Error downloading {filename}: {e}')
+                failed.append(filename)
+    if failed:
+        raise RuntimeError(f'Failed to download {", ".join(sorted(failed))}')
+
+def main(raw_data_relative_path="./data/raw",
+        filenames = ["caracteristiques-2021.csv", "lieux-2021.csv", "usagers-2021.csv",
                     "vehicules-2021.csv"],
-        bucket_folder_url= "https://mlops-project-db.s3.eu-west-1.amazonaws.com/accidents/"          
+        bucket_folder_url= "https://mlops-project-db.s3.eu-west-1.amazonaws.com/accidents/",
+        max_workers=int(os.getenv("RAW_DATA_DOWNLOAD_WORKERS", "4"))
         ):
     """ Upload data from AWS s3 in ./data/raw
     """
-    import_raw_data(raw_data_relative_path, filenames, bucket_folder_url)
     logger = logging.getLogger(__name__)
     logger.info('making raw data set')
+    import_raw_data(raw_data_relative_path, filenames, bucket_folder_url, max_workers=max_workers)
 
 
 if __name__ == '__main__':
     log_fmt = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     logging.basicConfig(level=logging.INFO, format=log_fmt)
-    
-    main()
\ No newline at end of file
+
+    main()
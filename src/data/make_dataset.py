@@ -4,16 +4,71 @@ import numpy as np
 from pathlib import Path
 import click
 import logging
+import hashlib
+import json
+import re
+import shutil
+import tempfile
 from sklearn.model_selection import train_test_split
-from check_structure import check_existing_file, check_existing_folder
+from src.data.check_structure import check_existing_file, check_existing_folder
+from src.data.raw_schema import read_raw
+from src.data.raw_partitions import plan_partitions, read_bucket, spill_buckets
+from src.utils.profiling import start_run, stage
 import os
 
 logger = logging.getLogger(__name__)
 
+OUTPUT_FORMATS = ("parquet", "feather", "csv")
+
+# One BAAC release is four files per year, named as on data.gouv.fr
+RAW_FILENAMES = {
+    "users": "usagers-{year}.csv",
+    "caract": "caracteristiques-{year}.csv",
+    "places": "lieux-{year}.csv",
+    "veh": "vehicules-{year}.csv"
+}
+
+# Per-year preprocessed rows, reused while their raw files and this code are unchanged
+DEFAULT_CACHE_FOLDER = "./data/interim"
+
+# {year: partition key} of the years behind the preprocessed artifacts
+PARTITIONS_FILENAME = "partitions.json"
+
+# Changing any of these invalidates every cached partition
+PARTITION_CODE_FILES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "make_dataset.py"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "raw_schema.py"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "raw_partitions.py")
+]
+
+# Compact dtypes of the preprocessed features and target. Integer columns
+# that still hold NaN at write time are stored as float32 instead.
+PREPROCESSED_DTYPES = {
+    "place": "int8", "catu": "int8", "sexe": "int8", "secu1": "int8",
+    "year_acc": "int16", "victim_age": "int16", "catv": "int8", "obsm": "int8",
+    "motor": "int8", "catr": "int8", "circ": "int8", "surf": "int8",
+    "situ": "int8", "vma": "int16", "jour": "int8", "mois": "int8",
+    "lum": "int8", "dep": "int16", "com": "int32", "agg_": "int8",
+    "int": "int8", "atm": "int8", "col": "int8", "lat": "float32",
+    "long": "float32", "hour": "int8", "nb_victim": "int16",
+    "nb_vehicules": "int16", "grav": "int8"
+}
+
 @click.command()
 @click.argument('input_filepath', type=click.Path(exists=False), required=False)
 @click.argument('output_filepath', type=click.Path(exists=False), required=False)
-def main(input_filepath=None, output_filepath=None):
+@click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS),
+              default="parquet", show_default=True,
+              help="File format of the preprocessed X/y artifacts")
+@click.option('--year', 'years', type=int, multiple=True,
+              help="Year to include (repeatable); defaults to every year found in INPUT_FILEPATH")
+@click.option('--cache-dir', 'cache_folderpath', type=click.Path(), default=DEFAULT_CACHE_FOLDER,
+              show_default=True, help="Folder of the per-year preprocessed partitions")
+@click.option('--memory-budget', 'memory_budget_mb', type=click.IntRange(min=1),
+              envvar="PREPROCESS_MEMORY_BUDGET_MB",
+              help="Memory budget in MB; larger years are processed in Num_Acc hash buckets")
+def main(input_filepath=None, output_filepath=None, output_format="parquet", years=(),
+         cache_folderpath=DEFAULT_CACHE_FOLDER, memory_budget_mb=None):
     """ Runs data processing scripts to turn raw data from (../raw) into
         cleaned data ready to be analyzed (saved in ../preprocessed).
     """
@@ -34,101 +89,327 @@ def main(input_filepath=None, output_filepath=None):
     os.makedirs(input_filepath, exist_ok=True)
     os.makedirs(output_filepath, exist_ok=True)
 
-    # Формируем полные пути к файлам
-    input_filepath_users = os.path.join(input_filepath, "usagers-2021.csv")
-    input_filepath_caract = os.path.join(input_filepath, "caracteristiques-2021.csv")
-    input_filepath_places = os.path.join(input_filepath, "lieux-2021.csv")
-    input_filepath_veh = os.path.join(input_filepath, "vehicules-2021.csv")
+    # Years with all four raw files (usagers/caracteristiques/lieux/vehicules)
+    available_years = discover_years(input_filepath)
+    years = sorted(set(years)) if years else available_years
+    missing_years = [year for year in years if year not in available_years]
+    if missing_years:
+        raise click.ClickException(f"Incomplete or missing raw files in {input_filepath} for {missing_years}")
+    if not years:
+        raise click.ClickException(f"No raw BAAC files found in {input_filepath}")
+    logger.info(f'years: {years}')
 
     # Call the main data processing function
-    process_data(input_filepath_users, input_filepath_caract, input_filepath_places, input_filepath_veh, output_filepath)
+    raw_files = {year: raw_filepaths(input_filepath, year) for year in years}
+    memory_budget = memory_budget_mb * 2**20 if memory_budget_mb else None
+    profiler = start_run("preprocess")
+    process_data(raw_files, output_filepath, output_format=output_format, cache_folderpath=cache_folderpath,
+                 memory_budget=memory_budget)
+    profiler.finish().write()
+    # Only where a tracking server is configured (the Airflow containers)
+    if os.getenv("MLFLOW_TRACKING_URI"):
+        profiler.log_to_mlflow(experiment="Accidents_Prediction")
 
-def process_data(input_filepath_users, input_filepath_caract, input_filepath_places, input_filepath_veh, output_folderpath):
-    # Автоматическое создание выходной папки
+def raw_filepaths(input_folderpath, year):
+    """Paths of the four raw files of one year, keyed like process_year's arguments"""
+    return {key: os.path.join(input_folderpath, pattern.format(year=year))
+            for key, pattern in RAW_FILENAMES.items()}
+
+def discover_years(input_folderpath):
+    """Sorted years for which all four raw files are present"""
+    years = []
+    for filename in os.listdir(input_folderpath):
+        match = re.fullmatch(r"usagers-(\d{4})\.csv", filename)
+        if match is None:
+            continue
+        year = int(match.group(1))
+        if all(os.path.exists(path) for path in raw_filepaths(input_folderpath, year).values()):
+            years.append(year)
+    return sorted(years)
+
+def _remap_codes(series, mapping):
+    """Remap small integer codes through a lookup table in one pass.
+
+    Same result as series.replace(mapping) for integer columns (unmapped codes
+    are kept), without one scan per mapping entry.
+    """
+    values = series.to_numpy()
+    if values.size == 0 or not np.issubdtype(values.dtype, np.integer):
+        return series.replace(mapping)
+    keys = np.fromiter(mapping.keys(), dtype=np.int64)
+    low = min(int(values.min()), int(keys.min()))
+    high = max(int(values.max()), int(keys.max()))
+    table = np.arange(low, high + 1, dtype=np.int64)
+    table[keys - low] = np.fromiter(mapping.values(), dtype=np.int64)
+    remapped = table[values.astype(np.int64) - low].astype(values.dtype)
+    return pd.Series(remapped, index=series.index, name=series.name)
+
+def _year_from_num_acc(num_acc):
+    """Num_Acc is the 4-digit year followed by an 8-digit sequence number"""
+    return num_acc // 10**8
+
+def _victim_age(year_acc, an_nais):
+    """Age at the accident; implausible ages (<0 or >120) become NaN"""
+    age = year_acc - an_nais
+    return age.where((age >= 0) & (age <= 120))
+
+def _hour_from_hrmn(hrmn):
+    """Hour from 'HH:MM' strings (or HHMM integers in older releases)"""
+    if not pd.api.types.is_numeric_dtype(hrmn):
+        hrmn = hrmn.str.replace(":", "", regex=False).astype(int)
+    return hrmn // 100
+
+def _corsica_codes_to_int(series):
+    """Department/commune codes to int, with Corsica's 2A/2B as 201/202.
+
+    The string work only touches the distinct codes, rows just take the
+    converted value through their factorized index.
+    """
+    codes, uniques = pd.factorize(series)
+    converted = (pd.Index(uniques).astype(str)
+                 .str.replace("2A", "201", regex=False)
+                 .str.replace("2B", "202", regex=False)
+                 .astype(int))
+    return pd.Series(np.asarray(converted)[codes], index=series.index, name=series.name)
+
+def _compact(data):
+    """Cast features/target to PREPROCESSED_DTYPES (float32 where NaN remain)"""
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    dtypes = {}
+    for col in frame.columns:
+        dtype = PREPROCESSED_DTYPES.get(col)
+        if dtype is None:
+            continue
+        if dtype.startswith("int") and frame[col].isna().any():
+            dtype = "float32"
+        dtypes[col] = dtype
+    return frame.astype(dtypes).reset_index(drop=True)
+
+def save_preprocessed(data, output_folderpath, filename, output_format="parquet"):
+    """Write one preprocessed artifact and drop stale copies in other formats"""
+    output_filepath = os.path.join(output_folderpath, f'{filename}.{output_format}')
+    if output_format == "parquet":
+        _compact(data).to_parquet(output_filepath, index=False)
+    elif output_format == "feather":
+        _compact(data).to_feather(output_filepath)
+    else:
+        data.to_csv(output_filepath, index=False)
+
+    # Readers pick the first format they find, so leftovers must not linger
+    for other_format in OUTPUT_FORMATS:
+        stale_filepath = os.path.join(output_folderpath, f'{filename}.{other_format}')
+        if other_format != output_format and os.path.exists(stale_filepath):
+            os.remove(stale_filepath)
+    return output_filepath
+
+def _file_digest(filepath, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def partition_key(raw_files):
+    """Cache key of one year: hash of its raw files and of the processing code"""
+    digest = hashlib.sha256()
+    for filepath in PARTITION_CODE_FILES + [raw_files[key] for key in sorted(raw_files)]:
+        digest.update(_file_digest(filepath).encode())
+    return digest.hexdigest()[:16]
+
+def load_year_partition(year, raw_files, cache_folderpath=DEFAULT_CACHE_FOLDER, memory_budget=None, key=None):
+    """Preprocessed rows of one year, only recomputed when its inputs changed.
+
+    Partitions live in <cache_folderpath>/year=<year>/<partition_key>.parquet;
+    older partitions of the same year are removed once the new one is written.
+    With a memory_budget (bytes), years too large for it are processed with
+    process_year_partitioned, which writes the same partition. key is
+    partition_key(raw_files), when the caller already has it.
+    """
+    year_folderpath = os.path.join(cache_folderpath, f"year={year}")
+    partition_filename = f"{key or partition_key(raw_files)}.parquet"
+    partition_filepath = os.path.join(year_folderpath, partition_filename)
+    if os.path.exists(partition_filepath):
+        logger.info(f'{year}: using cached partition {partition_filepath}')
+        with stage("read_cache") as record:
+            df = pd.read_parquet(partition_filepath)
+            record["rows"] = len(df)
+        return df
+
+    os.makedirs(year_folderpath, exist_ok=True)
+    n_buckets = 1
+    if memory_budget is not None:
+        n_buckets, chunk_bytes = plan_partitions(raw_files.values(), memory_budget)
+    if n_buckets == 1:
+        logger.info(f'{year}: processing raw files')
+        df = _compact(process_year(**raw_files))
+    else:
+        logger.info(f'{year}: processing raw files in {n_buckets} buckets')
+        spill_folderpath = tempfile.mkdtemp(prefix=f".spill-{year}-", dir=cache_folderpath)
+        try:
+            df = _compact(process_year_partitioned(**raw_files, n_buckets=n_buckets,
+                                                   spill_folderpath=spill_folderpath,
+                                                   chunk_bytes=chunk_bytes))
+        finally:
+            shutil.rmtree(spill_folderpath, ignore_errors=True)
+    tmp_filepath = partition_filepath + ".tmp"
+    with stage("write_partition", rows=len(df)):
+        df.to_parquet(tmp_filepath, index=False)
+        os.replace(tmp_filepath, partition_filepath)
+    for filename in os.listdir(year_folderpath):
+        if filename != partition_filename:
+            os.remove(os.path.join(year_folderpath, filename))
+    return df
+
+def process_year(users, caract, places, veh):
+    """Cleaned, merged rows (features + grav) of one year's raw files"""
+    #--Importing dataset (only the columns we keep, see raw_schema.py)
+    with stage("read") as record:
+        df_users = read_raw("usagers", users)
+        df_caract = read_raw("caracteristiques", caract)
+        df_places = read_raw("lieux", places)
+        df_veh = read_raw("vehicules", veh)
+        record["rows"] = len(df_users) + len(df_caract) + len(df_places) + len(df_veh)
+    return _process_tables(df_users, df_caract, df_places, df_veh)
+
+def _users_order(chunk, first_row):
+    """Sort key reproducing process_year's row order: grav rank desc, then file order"""
+    grav_rank = _remap_codes(chunk["grav"], {1:1, 2:3, 3:4, 4:2}).to_numpy().astype(np.int64)
+    row = first_row + np.arange(len(chunk), dtype=np.int64)
+    return chunk.assign(_order=(-grav_rank << 40) + row)
+
+def process_year_partitioned(users, caract, places, veh, n_buckets, spill_folderpath, chunk_bytes):
+    """process_year for years larger than memory, one Num_Acc hash bucket at a time.
+
+    The raw files are spilled to n_buckets buckets (see raw_partitions), each
+    bucket is processed on its own and its rows written out before the next
+    one is read. Only the compacted result of the year is held at the end, to
+    restore the row order of process_year (so both give the same partition).
+    """
+    with stage("spill"):
+        spill_buckets("usagers", users, n_buckets, spill_folderpath, chunk_bytes, prepare=_users_order)
+        spill_buckets("caracteristiques", caract, n_buckets, spill_folderpath, chunk_bytes)
+        spill_buckets("lieux", places, n_buckets, spill_folderpath, chunk_bytes)
+        spill_buckets("vehicules", veh, n_buckets, spill_folderpath, chunk_bytes)
+
+    output_folderpath = os.path.join(spill_folderpath, "output")
     os.makedirs(output_folderpath, exist_ok=True)
-    
-    #--Importing dataset
-    df_users = pd.read_csv(input_filepath_users, sep=";")
-    df_caract = pd.read_csv(input_filepath_caract, sep=";", header=0, low_memory=False)
-    df_places = pd.read_csv(input_filepath_places, sep = ";", encoding='utf-8')
-    df_veh = pd.read_csv(input_filepath_veh, sep=";")
+    for bucket in range(n_buckets):
+        with stage("read") as record:
+            df_users = read_bucket("usagers", bucket, spill_folderpath)
+            if df_users.empty:
+                continue
+            df_caract = read_bucket("caracteristiques", bucket, spill_folderpath)
+            df_places = read_bucket("lieux", bucket, spill_folderpath)
+            df_veh = read_bucket("vehicules", bucket, spill_folderpath)
+            record["rows"] = len(df_users) + len(df_caract) + len(df_places) + len(df_veh)
+        df = _process_tables(df_users, df_caract, df_places, df_veh)
+        with stage("write_bucket", rows=len(df)):
+            _compact(df).to_parquet(os.path.join(output_folderpath, f"{bucket}.parquet"), index=False)
+        logger.debug(f'bucket {bucket + 1}/{n_buckets}: {len(df)} rows')
 
+    with stage("concat") as record:
+        frames = [pd.read_parquet(os.path.join(output_folderpath, filename))
+                  for filename in os.listdir(output_folderpath)]
+        if not frames:
+            return pd.DataFrame(columns=list(PREPROCESSED_DTYPES))
+        df = pd.concat(frames, ignore_index=True).sort_values("_order", kind="stable")
+        record["rows"] = len(df)
+    return df.drop(columns="_order")
+
+def _process_tables(df_users, df_caract, df_places, df_veh):
     #--Creating new columns
-    nb_victim = pd.crosstab(df_users.Num_Acc, "count").reset_index()
-    nb_vehicules = pd.crosstab(df_veh.Num_Acc, "count").reset_index()
-    df_users["year_acc"] = df_users["Num_Acc"].astype(str).apply(lambda x : x[:4]).astype(int)
-    df_users["victim_age"] = df_users["year_acc"]-df_users["an_nais"]
-    for i in df_users["victim_age"] :
-        if (i>120)|(i<0):
-            df_users["victim_age"].replace(i,np.nan)
-    df_caract["hour"] = df_caract["hrmn"].astype(str).apply(lambda x : x[:-3])
-    df_caract.drop(['hrmn', 'an'], inplace=True, axis=1)
-    df_users.drop(['an_nais'], inplace=True, axis=1)
-
-    #--Replacing names 
-    df_users['grav'] = df_users['grav'].replace({1:1, 2:3, 3:4, 4:2})
-    df_caract.rename({"agg" : "agg_"},  inplace = True, axis = 1)
-    corse_replace = {"2A":"201", "2B":"202"}
-    df_caract["dep"] = df_caract["dep"].str.replace("2A", "201")
-    df_caract["dep"] = df_caract["dep"].str.replace("2B", "202")
-    df_caract["com"] = df_caract["com"].str.replace("2A", "201")
-    df_caract["com"] = df_caract["com"].str.replace("2B", "202")
-
-    #--Converting columns types
-    df_caract[["dep","com", "hour"]] = df_caract[["dep","com", "hour"]].astype(int)
-
-    dico_to_float = { 'lat': float, 'long':float}
-    df_caract["lat"] = df_caract["lat"].str.replace(',', '.')
-    df_caract["long"] = df_caract["long"].str.replace(',', '.')
-    df_caract = df_caract.astype(dico_to_float)
-
-    #--Grouping modalities 
-    dico = {1:0, 2:1, 3:1, 4:1, 5:1, 6:1,7:1, 8:0, 9:0}
-    df_caract["atm"] = df_caract["atm"].replace(dico)
-    catv_value = [0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,30,31,32,33,34,35,36,37,38,39,40,41,42,43,50,60,80,99]
-    catv_value_new = [0,1,1,2,1,1,6,2,5,5,5,5,5,4,4,4,4,4,3,3,4,4,1,1,1,1,1,6,6,3,3,3,3,1,1,1,1,1,0,0]
-    df_veh['catv'] = df_veh['catv'].replace(dict(zip(catv_value, catv_value_new)))
+    with stage("counts"):
+        nb_victim = df_users.groupby("Num_Acc").size().rename("nb_victim").reset_index()
+        nb_vehicules = df_veh.groupby("Num_Acc").size().rename("nb_vehicules").reset_index()
+    with stage("features"):
+        df_users["year_acc"] = _year_from_num_acc(df_users["Num_Acc"])
+        df_users["victim_age"] = _victim_age(df_users["year_acc"], df_users["an_nais"])
+        df_caract["hour"] = _hour_from_hrmn(df_caract["hrmn"])
+        df_caract.drop(['hrmn'], inplace=True, axis=1)
+        df_users.drop(['an_nais'], inplace=True, axis=1)
+
+        #--Replacing names
+        df_users['grav'] = _remap_codes(df_users['grav'], {1:1, 2:3, 3:4, 4:2})
+        df_caract.rename({"agg" : "agg_"},  inplace = True, axis = 1)
+
+        #--Converting columns types
+        df_caract["dep"] = _corsica_codes_to_int(df_caract["dep"])
+        df_caract["com"] = _corsica_codes_to_int(df_caract["com"])
+
+        #--Grouping modalities
+        dico = {1:0, 2:1, 3:1, 4:1, 5:1, 6:1,7:1, 8:0, 9:0}
+        df_caract["atm"] = _remap_codes(df_caract["atm"], dico)
+        catv_value = [0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,30,31,32,33,34,35,36,37,38,39,40,41,42,43,50,60,80,99]
+        catv_value_new = [0,1,1,2,1,1,6,2,5,5,5,5,5,4,4,4,4,4,3,3,4,4,1,1,1,1,1,6,6,3,3,3,3,1,1,1,1,1,0,0]
+        df_veh['catv'] = _remap_codes(df_veh['catv'], dict(zip(catv_value, catv_value_new)))
 
     #--Merging datasets 
-    fusion1= df_users.merge(df_veh, on = ["Num_Acc","num_veh", "id_vehicule"], how="inner")
-    fusion1 = fusion1.sort_values(by = "grav", ascending = False)
-    fusion1 = fusion1.drop_duplicates(subset = ['Num_Acc'], keep="first")
-    fusion2 = fusion1.merge(df_places, on = "Num_Acc", how = "left")
-    df = fusion2.merge(df_caract, on = 'Num_Acc', how="left")
+    with stage("merge") as record:
+        fusion1= df_users.merge(df_veh, on = ["Num_Acc","num_veh", "id_vehicule"], how="inner")
+        fusion1 = fusion1.sort_values(by = "grav", ascending = False, kind = "stable")
+        fusion1 = fusion1.drop_duplicates(subset = ['Num_Acc'], keep="first")
+        fusion2 = fusion1.merge(df_places, on = "Num_Acc", how = "left")
+        df = fusion2.merge(df_caract, on = 'Num_Acc', how="left")
+
+        #--Adding new columns
+        df = df.merge(nb_victim, on = "Num_Acc", how = "inner")
+        df = df.merge(nb_vehicules, on = "Num_Acc", how = "inner")
+        record["rows"] = len(df)
 
-    #--Adding new columns
-    df = df.merge(nb_victim, on = "Num_Acc", how = "inner")
-    df.rename({"count" :"nb_victim"},axis = 1, inplace = True) 
-    df = df.merge(nb_vehicules, on = "Num_Acc", how = "inner") 
-    df.rename({"count" :"nb_vehicules"},axis = 1, inplace = True)
+    with stage("clean") as record:
+        #--Modification of the target variable  : 1 : prioritary // 0 : non-prioritary
+        df['grav'] = _remap_codes(df['grav'], {2:0, 3:1, 4:1})
 
-    #--Modification of the target variable  : 1 : prioritary // 0 : non-prioritary
-    df['grav'] = df['grav'].replace({2:0, 3:1, 4:1})
+        #--Replacing values -1 and 0
+        col_to_replace0_na = [ "catv", "motor"]
+        col_to_replace1_na = [ "secu1", "catv", "obsm", "motor", "circ", "surf", "situ", "vma", "atm", "col"]
+        df[col_to_replace1_na] = df[col_to_replace1_na].replace(-1, np.nan)
+        df[col_to_replace0_na] = df[col_to_replace0_na].replace(0, np.nan)
 
-    #--Replacing values -1 and 0 
-    col_to_replace0_na = [ "trajet", "catv", "motor"]
-    col_to_replace1_na = [ "trajet", "secu1", "catv", "obsm", "motor", "circ", "surf", "situ", "vma", "atm", "col"]
-    df[col_to_replace1_na] = df[col_to_replace1_na].replace(-1, np.nan)
-    df[col_to_replace0_na] = df[col_to_replace0_na].replace(0, np.nan)
+        #--Dropping columns (the other unused BAAC columns are never read)
+        list_to_drop = ['Num_Acc', 'id_vehicule', 'num_veh']
+        df.drop(list_to_drop, axis=1, inplace=True)
 
-    #--Dropping columns 
-    list_to_drop = ['senc','larrout','actp', 'manv', 'choc', 'nbv', 'prof', 'plan', 'Num_Acc', 'id_vehicule', 'num_veh', 'pr', 'pr1','voie', 'trajet',"secu2", "secu3",'adr', 'v1', 'lartpc','occutc','v2','vosp','locp','etatp', 'infra', 'obs' ]
-    df.drop(list_to_drop, axis=1, inplace=True)
+        #--Dropping lines with NaN values
+        col_to_drop_lines = ['catv', 'vma', 'secu1', 'obsm', 'atm']
+        df = df.dropna(subset = col_to_drop_lines, axis=0)
+        record["rows"] = len(df)
+    return df
 
-    #--Dropping lines with NaN values
-    col_to_drop_lines = ['catv', 'vma', 'secu1', 'obsm', 'atm']
-    df = df.dropna(subset = col_to_drop_lines, axis=0)
+def process_data(raw_files, output_folderpath, output_format="parquet", cache_folderpath=DEFAULT_CACHE_FOLDER,
+                 memory_budget=None):
+    """Build X/y train/test from {year: raw_filepaths(...)}.
 
+    Each year goes through process_year once and is cached (see
+    load_year_partition), so adding a year only processes that year.
+    memory_budget (bytes) bounds the processing of a single year.
+    """
+    # Автоматическое создание выходной папки
+    os.makedirs(output_folderpath, exist_ok=True)
+
+    with stage("partition_keys"):
+        partition_keys = {year: partition_key(raw_files[year]) for year in sorted(raw_files)}
+    frames = []
+    for year, key in partition_keys.items():
+        with stage(f"year_{year}") as record:
+            frames.append(load_year_partition(year, raw_files[year], cache_folderpath, memory_budget, key=key))
+            record["rows"] = len(frames[-1])
+    with stage("concat") as record:
+        df = pd.concat(frames, ignore_index=True)
+        record["rows"] = len(df)
+    logger.info(f'{len(df)} rows from {len(frames)} year(s)')
 
     target = df['grav']
     feats = df.drop(['grav'], axis = 1)
 
-    X_train, X_test, y_train, y_test = train_test_split(feats, target, test_size=0.3, random_state = 42)
+    with stage("split", rows=len(df)):
+        X_train, X_test, y_train, y_test = train_test_split(feats, target, test_size=0.3, random_state = 42)
 
     #--Filling NaN values
-    col_to_fill_na = ["surf", "circ", "col", "motor"]
-    X_train[col_to_fill_na] = X_train[col_to_fill_na].fillna(X_train[col_to_fill_na].mode().iloc[0])
-    X_test[col_to_fill_na] = X_test[col_to_fill_na].fillna(X_train[col_to_fill_na].mode().iloc[0])
+    with stage("fillna"):
+        col_to_fill_na = ["surf", "circ", "col", "motor", "victim_age"]
+        X_train[col_to_fill_na] = X_train[col_to_fill_na].fillna(X_train[col_to_fill_na].mode().iloc[0])
+        X_test[col_to_fill_na] = X_test[col_to_fill_na].fillna(X_train[col_to_fill_na].mode().iloc[0])
 
     # Create folder if necessary 
     if check_existing_folder(output_folderpath) :
@@ -137,9 +418,13 @@ def process_data(input_filepath_users, input_filepath_caract, input_filepath_pla
     #--Saving the dataframes to their respective output file paths
     logger.info(f'Saving preprocessed data to {output_folderpath}')
     for file, filename in zip([X_train, X_test, y_train, y_test], ['X_train', 'X_test', 'y_train', 'y_test']):
-        output_filepath = os.path.join(output_folderpath, f'{filename}.csv')
-        file.to_csv(output_filepath, index=False)
-        logger.debug(f'Saved {filename}.csv with shape {file.shape}') 
+        with stage(f"write_{filename}", rows=len(file)):
+            save_preprocessed(file, output_folderpath, filename, output_format)
+        logger.debug(f'Saved {filename}.{output_format} with shape {file.shape}')
+
+    # Which version of each year's data the artifacts hold (tree lineage in train_model)
+    with open(os.path.join(output_folderpath, PARTITIONS_FILENAME), "w") as f:
+        json.dump({str(year): key for year, key in partition_keys.items()}, f, indent=2)
 
     logger.info(f'Successfully saved all preprocessed data to {output_folderpath}')
 
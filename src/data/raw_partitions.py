@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Hash-partitioning of the raw BAAC files by Num_Acc.
+
+Every row of an accident (its users, vehicles, place and characteristics)
+lands in the same bucket, so the per-accident joins and counts of
+make_dataset can run one bucket at a time. The raw files are read in chunks
+and spilled to one parquet file per (file, bucket, chunk); a bucket is then
+read back on its own, which bounds memory by the size of a chunk and of a
+bucket rather than of the whole year.
+"""
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data.raw_schema import RAW_SCHEMAS, read_raw
+
+# Peak memory of make_dataset.process_year per byte of raw CSV, measured on
+# synthetic years (~1.3) and rounded up for the longer strings of real files
+MEMORY_PER_RAW_BYTE = 2.0
+
+# Reading a chunk and splitting it into buckets holds about this many
+# copies of the chunk's CSV bytes at once
+MEMORY_PER_CHUNK_BYTE = 4.0
+
+
+def plan_partitions(filepaths, memory_budget):
+    """(n_buckets, chunk_bytes) keeping one year's processing under memory_budget bytes.
+
+    One bucket means the year fits in memory and needs no partitioning.
+    """
+    raw_bytes = sum(os.path.getsize(path) for path in filepaths)
+    n_buckets = max(1, math.ceil(raw_bytes * MEMORY_PER_RAW_BYTE / memory_budget))
+    chunk_bytes = max(1 << 20, int(memory_budget / MEMORY_PER_CHUNK_BYTE))
+    return n_buckets, chunk_bytes
+
+
+def _rows_per_chunk(filepath, chunk_bytes, sample_bytes=1 << 16):
+    """Number of CSV lines in about chunk_bytes, from the first lines of the file"""
+    with open(filepath, "rb") as f:
+        sample = f.read(sample_bytes)
+    n_lines = max(1, sample.count(b"\n"))
+    return max(1000, int(chunk_bytes / (len(sample) / n_lines)))
+
+
+def bucket_of(num_acc, n_buckets):
+    """Bucket of each Num_Acc (hashed, as Num_Acc are sequential per year)"""
+    return pd.util.hash_array(num_acc.to_numpy()) % np.uint64(n_buckets)
+
+
+def spill_buckets(kind, filepath, n_buckets, spill_folderpath, chunk_bytes, prepare=None):
+    """Split one raw file into n_buckets folders of parquet chunks.
+
+    prepare(chunk, first_row) may add columns before the split, e.g. the
+    position of each row in the file.
+    """
+    chunk_rows = _rows_per_chunk(filepath, chunk_bytes)
+    first_row = 0
+    for chunk_index, chunk in enumerate(read_raw(kind, filepath, chunksize=chunk_rows)):
+        if prepare is not None:
+            chunk = prepare(chunk, first_row)
+        first_row += len(chunk)
+        buckets = bucket_of(chunk["Num_Acc"], n_buckets)
+        for bucket, rows in chunk.groupby(buckets, sort=False):
+            bucket_folderpath = os.path.join(spill_folderpath, kind, str(bucket))
+            os.makedirs(bucket_folderpath, exist_ok=True)
+            rows.to_parquet(os.path.join(bucket_folderpath, f"{chunk_index}.parquet"), index=False)
+
+
+def read_bucket(kind, bucket, spill_folderpath):
+    """All rows of one bucket of one raw file, in file order"""
+    bucket_folderpath = os.path.join(spill_folderpath, kind, str(bucket))
+    if not os.path.isdir(bucket_folderpath):
+        dtypes = RAW_SCHEMAS[kind]["dtype"]
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+    chunk_filenames = sorted(os.listdir(bucket_folderpath), key=lambda name: int(name.split(".")[0]))
+    return pd.concat(
+        [pd.read_parquet(os.path.join(bucket_folderpath, name)) for name in chunk_filenames],
+        ignore_index=True
+    )
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Declared layout of the BAAC raw files used by make_dataset.
+
+Only the columns that make it into the preprocessed features are read
+(plus the join keys and the inputs of derived features), each straight into
+its final compact dtype. Code columns are small integers (-1 = unknown in
+the BAAC nomenclature) stored as int8; low-cardinality text codes are
+categoricals.
+"""
+import pandas as pd
+
+RAW_SCHEMAS = {
+    "usagers": {
+        "dtype": {
+            "Num_Acc": "int64",
+            "id_vehicule": "str",
+            "num_veh": "str",
+            "place": "int8",
+            "catu": "int8",
+            "grav": "int8",
+            "sexe": "int8",
+            # Missing for some users, so it can't be an integer column
+            "an_nais": "float32",
+            "secu1": "int8",
+        },
+    },
+    "caracteristiques": {
+        "dtype": {
+            "Num_Acc": "int64",
+            "jour": "int8",
+            "mois": "int8",
+            "hrmn": "category",
+            "lum": "int8",
+            # Text because of Corsica's 2A/2B codes
+            "dep": "category",
+            "com": "category",
+            "agg": "int8",
+            "int": "int8",
+            "atm": "int8",
+            "col": "int8",
+            "lat": "float32",
+            "long": "float32",
+        },
+        # lat/long are written with decimal commas
+        "decimal": ",",
+    },
+    "lieux": {
+        "dtype": {
+            "Num_Acc": "int64",
+            "catr": "int8",
+            "circ": "int8",
+            "surf": "int8",
+            "situ": "int8",
+            "vma": "int16",
+        },
+        "encoding": "utf-8",
+    },
+    "vehicules": {
+        "dtype": {
+            "Num_Acc": "int64",
+            "id_vehicule": "str",
+            "num_veh": "str",
+            "catv": "int8",
+            "obsm": "int8",
+            "motor": "int8",
+        },
+    },
+}
+
+
+def read_raw(kind, filepath, **kwargs):
+    """Read one raw BAAC file with its declared columns and dtypes.
+
+    Extra keyword arguments go to pd.read_csv (e.g. chunksize).
+    """
+    schema = RAW_SCHEMAS[kind]
+    return pd.read_csv(
+        filepath,
+        sep=";",
+        usecols=list(schema["dtype"]),
+        dtype=schema["dtype"],
+        decimal=schema.get("decimal", "."),
+        encoding=schema.get("encoding"),
+        **kwargs
+    )
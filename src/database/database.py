@@ -1,34 +1,57 @@
+import os
 import sqlite3
+import threading
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+SELECT_USER = "SELECT * FROM users WHERE username = ?"
+
+# USERS_DB_PATH, read by init_db (so that a .env loaded by the app is seen)
+_database_path = None
+_init_lock = threading.Lock()
+
+
 def get_db():
-    conn = sqlite3.connect("users.db")
+    """A connection to the users database, created (once per process) on first use"""
+    conn = sqlite3.connect(init_db())
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db():
-    db = get_db()
-    try:
-        db.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL
-        )
-        """)
-        
+def init_db() -> str:
+    """Create the schema and the default admin, once per process; returns
+    the database path.
+
+    Runs on first use rather than at import, so API cold start doesn't pay
+    for it; the admin password is only hashed when that row is missing.
+    """
+    global _database_path
+    if _database_path is not None:
+        return _database_path
+    with _init_lock:
+        if _database_path is not None:
+            return _database_path
+        path = os.getenv("USERS_DB_PATH", "users.db")
+        db = sqlite3.connect(path)
         try:
-            db.execute(
-                "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                ("admin", pwd_context.hash("admin123"), "admin")
+            db.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                role TEXT NOT NULL
             )
+            """)
+            if db.execute(SELECT_USER, ("admin",)).fetchone() is None:
+                try:
+                    db.execute(
+                        "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                        ("admin", pwd_context.hash("admin123"), "admin")
+                    )
+                except sqlite3.IntegrityError:
+                    pass
             db.commit()
-        except sqlite3.IntegrityError:
-            pass
-    finally:
-        db.close()
-
-init_db()
\ No newline at end of file
+        finally:
+            db.close()
+        _database_path = path
+        return path
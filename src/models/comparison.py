@@ -0,0 +1,113 @@
+"""Champion/challenger comparison on precomputed test-set probabilities.
+
+The bootstrap never re-predicts. Rows with the same (new score, prod score,
+label) are interchangeable, so resampling rows is the same as drawing
+multinomial counts over those distinct cells, and forest probabilities are
+coarse (multiples of 1/n_trees for pure leaves): there are usually far
+fewer cells than rows. The weighted ROC AUC of both models is then computed for a block
+of resamples at once: the rank of every positive cell among the negative
+ones is found a single time, and each resample only needs a cumulative sum
+of its negative weights (AUC as the weighted share of positive/negative
+pairs ranked correctly, ties counting one half).
+"""
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+
+# Resamples per block: this many array elements divided by the number of rows
+BLOCK_ELEMENTS = 4_000_000
+
+
+class _RankedScores:
+    """Where each positive cell of one model ranks among its negative cells, by score"""
+
+    def __init__(self, y, scores):
+        positive = np.asarray(y) == 1
+        negative_cells = np.flatnonzero(~positive)
+        self.negative_cells = negative_cells[np.argsort(scores[negative_cells], kind="stable")]
+        self.positive_cells = np.flatnonzero(positive)
+        negative_scores = scores[self.negative_cells]
+        positive_scores = scores[self.positive_cells]
+        # Negatives ranked strictly below / not above each positive
+        self.below = np.searchsorted(negative_scores, positive_scores, side="left")
+        self.not_above = np.searchsorted(negative_scores, positive_scores, side="right")
+
+    def auc(self, weights):
+        """Weighted ROC AUC for each row of weights (resamples x cells)"""
+        cumulative = np.zeros((len(weights), len(self.negative_cells) + 1))
+        np.cumsum(weights[:, self.negative_cells], axis=1, out=cumulative[:, 1:])
+        positive = weights[:, self.positive_cells]
+        below = cumulative[:, self.below]
+        tied = cumulative[:, self.not_above] - below
+        correct = (positive * (below + 0.5 * tied)).sum(axis=1)
+        return correct / (positive.sum(axis=1) * cumulative[:, -1])
+
+
+def bootstrap_weights(counts, row_cells, n_resamples, rng):
+    """Resampled count of each cell (resamples x cells) for bootstraps of all rows.
+
+    A multinomial draw over the cells when they are much fewer than the rows,
+    otherwise rows drawn with replacement and counted per cell.
+    """
+    n_rows, n_cells = len(row_cells), len(counts)
+    if n_cells * 4 <= n_rows:
+        return rng.multinomial(n_rows, counts / n_rows, size=n_resamples)
+    draws = row_cells[rng.integers(0, n_rows, size=(n_resamples, n_rows))]
+    draws += np.arange(n_resamples)[:, None] * n_cells
+    return np.bincount(draws.ravel(), minlength=n_resamples * n_cells).reshape(n_resamples, n_cells)
+
+
+def bootstrap_auc_delta(y, proba_new, proba_prod, n_resamples=1000, confidence=0.95, seed=42):
+    """AUC of both models, their delta (new - prod) and its bootstrap confidence interval"""
+    y = np.asarray(y)
+    cells, row_cells, counts = np.unique(np.column_stack([proba_new, proba_prod, y]), axis=0,
+                                         return_inverse=True, return_counts=True)
+    row_cells = row_cells.ravel()
+    new, prod = _RankedScores(cells[:, 2], cells[:, 0]), _RankedScores(cells[:, 2], cells[:, 1])
+    rng = np.random.default_rng(seed)
+    block = max(1, BLOCK_ELEMENTS // len(row_cells))
+    deltas = []
+    for start in range(0, n_resamples, block):
+        weights = bootstrap_weights(counts, row_cells, min(block, n_resamples - start), rng)
+        deltas.append(new.auc(weights) - prod.auc(weights))
+    deltas = np.concatenate(deltas)
+    # A resample without one of the classes has no AUC
+    deltas = deltas[np.isfinite(deltas)]
+
+    auc_new = roc_auc_score(y, proba_new)
+    auc_prod = roc_auc_score(y, proba_prod)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(deltas, [alpha, 1 - alpha])
+    return {
+        "auc_new": float(auc_new),
+        "auc_prod": float(auc_prod),
+        "auc_delta": float(auc_new - auc_prod),
+        "ci_low": float(low),
+        "ci_high": float(high),
+        "confidence": confidence,
+        "resamples": int(len(deltas))
+    }
+
+
+def segment_metrics(X, y, proba_new, proba_prod, segment_cols, min_rows=200):
+    """AUC of both models per value of each segment column.
+
+    Segments with fewer than min_rows rows or a single class are skipped.
+    """
+    frame = pd.DataFrame({"y": np.asarray(y), "new": proba_new, "prod": proba_prod})
+    report = {}
+    for col in segment_cols:
+        segments = {}
+        for value, rows in frame.groupby(np.asarray(X[col]), sort=True):
+            if len(rows) < min_rows or rows["y"].nunique() < 2:
+                continue
+            auc_new = roc_auc_score(rows["y"], rows["new"])
+            auc_prod = roc_auc_score(rows["y"], rows["prod"])
+            segments[str(value)] = {
+                "rows": int(len(rows)),
+                "auc_new": float(auc_new),
+                "auc_prod": float(auc_prod),
+                "auc_delta": float(auc_new - auc_prod)
+            }
+        report[col] = segments
+    return report
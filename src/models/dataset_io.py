@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+PREPROCESSED_DIR = "data/preprocessed"
+
+# Same order as make_dataset.OUTPUT_FORMATS: the first file found wins
+FORMATS = ("parquet", "feather", "csv")
+
+# Written by make_dataset next to the artifacts
+PARTITIONS_FILENAME = "partitions.json"
+
+PROD_MODEL_PATH = "src/models/prod_model.joblib"
+# Digest of the prod model, written by train and by evaluate when it
+# promotes: the train stage's DVC dependency on the prod model, which can't
+# be one itself (it is an out of evaluate: a train -> evaluate -> train cycle)
+PROD_STAMP_PATH = "src/models/prod_model.json"
+
+
+def preprocessed_path(name, folder=PREPROCESSED_DIR):
+    """Path of a preprocessed artifact (X_train, y_test, ...) in whichever format exists"""
+    for file_format in FORMATS:
+        path = os.path.join(folder, f"{name}.{file_format}")
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No preprocessed {name} in {folder} (looked for {', '.join(FORMATS)})")
+
+
+def read_preprocessed(name, folder=PREPROCESSED_DIR):
+    """Load a preprocessed artifact with the dtypes it was written with"""
+    path = preprocessed_path(name, folder)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if path.endswith(".feather"):
+        return pd.read_feather(path)
+    return pd.read_csv(path)
+
+
+def read_partitions(folder=PREPROCESSED_DIR):
+    """{year: partition key} of the data in the preprocessed artifacts, {} if unknown"""
+    try:
+        with open(os.path.join(folder, PARTITIONS_FILENAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_prod_stamp(model_path=PROD_MODEL_PATH, stamp_path=PROD_STAMP_PATH):
+    """Record the digest of the prod model (None if there is none yet)"""
+    digest = None
+    if os.path.exists(model_path):
+        sha256 = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+    with open(stamp_path, "w") as f:
+        json.dump({"sha256": digest}, f)
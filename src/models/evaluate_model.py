@@ -1,22 +1,119 @@
 import os
+import json
 import shutil
 import joblib
-import pandas as pd
-from sklearn.metrics import roc_auc_score
+from concurrent.futures import ThreadPoolExecutor
 import mlflow
 from mlflow import MlflowClient
+from src.models.dataset_io import read_preprocessed, write_prod_stamp
+from src.models.comparison import bootstrap_auc_delta, segment_metrics
+from src.utils.profiling import start_run, stage
 
 mlflow.set_tracking_uri("http://mlflow:5000")
 
+# The trained model replaces prod when the lower bound of the confidence
+# interval of its AUC gain is above EVAL_MIN_AUC_DELTA (the same 0.01
+# margin the point-estimate rule used to require)
+EVAL_BOOTSTRAP = int(os.getenv("EVAL_BOOTSTRAP", "1000"))
+EVAL_CONFIDENCE = float(os.getenv("EVAL_CONFIDENCE", "0.95"))
+EVAL_MIN_AUC_DELTA = float(os.getenv("EVAL_MIN_AUC_DELTA", "0.01"))
+# An incremental model (TRAIN_MODE=incremental) keeps every prod tree and adds
+# a few grown on new years, so its AUC stays within a few thousandths of
+# prod's: it replaces prod unless the CI says it is worse by more than this
+EVAL_INCREMENTAL_MARGIN = float(os.getenv("EVAL_INCREMENTAL_MARGIN", "0.005"))
+SEGMENT_COLUMNS = ["dep", "catv", "lum"]
+EVALUATION_REPORT_PATH = "src/models/evaluation.json"
+
+def replace_dir(src, dst):
+    """Move directory src to dst, replacing the current dst.
+
+    The old dst is renamed aside and only deleted once src is in its place:
+    dst is missing between two renames, never while a tree is being copied
+    or deleted.
+    """
+    old = f"{dst}.old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(dst):
+        os.replace(dst, old)
+    if src is not None:
+        os.replace(src, dst)
+    shutil.rmtree(old, ignore_errors=True)
+
+def promote_trained_model():
+    """Copy the trained model (pickle and flat forest) over the prod one.
+
+    Artifacts are copied next to their target and renamed into place, so the
+    API's model watcher never picks up a half-written file. The flat forest
+    goes first: once the pickle (what the watcher keys on by default) is
+    replaced, both are the new model. A prod flat forest without a trained
+    one to replace it is removed rather than left paired with the new pickle.
+    """
+    if os.path.isdir("src/models/trained_model_flat"):
+        shutil.rmtree("src/models/prod_model_flat.tmp", ignore_errors=True)
+        shutil.copytree("src/models/trained_model_flat", "src/models/prod_model_flat.tmp")
+        replace_dir("src/models/prod_model_flat.tmp", "src/models/prod_model_flat")
+    else:
+        replace_dir(None, "src/models/prod_model_flat")
+
+    shutil.copy("src/models/trained_model.joblib", "src/models/prod_model.joblib.tmp")
+    os.replace("src/models/prod_model.joblib.tmp", "src/models/prod_model.joblib")
+    # Makes the next dvc repro retrain on top of the new prod model
+    write_prod_stamp()
+
 def load_data():
-    X_test = pd.read_csv("data/preprocessed/X_test.csv")
-    y_test = pd.read_csv("data/preprocessed/y_test.csv").squeeze()
+    with stage("read") as record:
+        X_test = read_preprocessed("X_test")
+        y_test = read_preprocessed("y_test").squeeze()
+        record["rows"] = len(X_test)
     return X_test, y_test
 
+def score_models(models, X):
+    """Positive-class probabilities of each model on X, computed concurrently"""
+    n_jobs = max(1, (os.cpu_count() or 1) // len(models))
+
+    def score(model):
+        model.set_params(n_jobs=n_jobs)
+        return model.predict_proba(X)[:, 1]
+
+    with ThreadPoolExecutor(max_workers=len(models)) as executor:
+        return list(executor.map(score, models))
+
+def compare_models(new_model, prod_model, X_test, y_test):
+    """AUC delta with its bootstrap CI, per-segment AUCs and the promotion decision"""
+    with stage("score", rows=len(X_test)):
+        proba_new, proba_prod = score_models([new_model, prod_model], X_test)
+    with stage("bootstrap"):
+        report = bootstrap_auc_delta(y_test, proba_new, proba_prod,
+                                     n_resamples=EVAL_BOOTSTRAP, confidence=EVAL_CONFIDENCE)
+    train_info = getattr(new_model, "train_info_", {})
+    if train_info.get("train_mode") == "incremental":
+        # Non-inferiority, and only if trees were actually added
+        report["min_auc_delta"] = -EVAL_INCREMENTAL_MARGIN
+        report["promote"] = train_info.get("new_trees", 0) > 0 and report["ci_low"] > -EVAL_INCREMENTAL_MARGIN
+    else:
+        report["min_auc_delta"] = EVAL_MIN_AUC_DELTA
+        report["promote"] = report["ci_low"] > EVAL_MIN_AUC_DELTA
+    report["train_mode"] = train_info.get("train_mode", "full")
+    with stage("segments"):
+        report["segments"] = segment_metrics(X_test, y_test, proba_new, proba_prod, SEGMENT_COLUMNS)
+    return report
+
+def write_report(report, path=EVALUATION_REPORT_PATH):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
 def main():
+    profiler = start_run("evaluate")
+    evaluate()
+    profiler.finish().write()
+    profiler.log_to_mlflow(experiment="Accidents_Prediction")
+
+def evaluate():
     client = MlflowClient()
     if not os.path.exists("src/models/prod_model.joblib"):
-        shutil.copy("src/models/trained_model.joblib", "src/models/prod_model.joblib")
+        with stage("promote"):
+            promote_trained_model()
+        write_report({"promote": True, "first_version": True})
         print("Prod-model created (first version)")
         
         # Get the latest version of the model
@@ -32,16 +129,22 @@ def main():
         return
 
     X_test, y_test = load_data()
-    new_model = joblib.load("src/models/trained_model.joblib")
-    prod_model = joblib.load("src/models/prod_model.joblib")
+    with stage("load_models"):
+        new_model = joblib.load("src/models/trained_model.joblib")
+        prod_model = joblib.load("src/models/prod_model.joblib")
 
-    new_auc = roc_auc_score(y_test, new_model.predict_proba(X_test)[:, 1])
-    prod_auc = roc_auc_score(y_test, prod_model.predict_proba(X_test)[:, 1])
+    report = compare_models(new_model, prod_model, X_test, y_test)
+    write_report(report)
+    new_auc = report["auc_new"]
+    print(f"AUC new {new_auc:.4f} vs prod {report['auc_prod']:.4f}: delta {report['auc_delta']:+.4f}, "
+          f"{report['confidence']:.0%} CI [{report['ci_low']:+.4f}, {report['ci_high']:+.4f}]")
 
-    # Update prod-model when improving (threshold +1%)
-    if new_auc > prod_auc + 0.01:
+    # Update prod-model when the whole CI of the gain is above the threshold
+    # (min_auc_delta: negative for incremental models)
+    if report["promote"]:
         # 1. Copy the model
-        shutil.copy("src/models/trained_model.joblib", "src/models/prod_model.joblib")
+        with stage("promote"):
+            promote_trained_model()
         
         # 2. Get the latest version (not via active_run)
         versions = client.search_model_versions("name='Accidents_RF_Model'")
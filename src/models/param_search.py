@@ -0,0 +1,125 @@
+"""Successive-halving search over RandomForest params within a core and time budget.
+
+Candidates are sampled from a grid. Each round fits the surviving candidates
+on a larger subsample of the training rows (all of them in the last round)
+and keeps the best 1/factor by validation ROC AUC, so weak configs are
+dropped after cheap fits. Trials run in a process pool sized so that
+workers x n_jobs never exceeds the core budget: many single-threaded trials
+in the first rounds, fewer multi-threaded ones at the end. At the deadline
+the running trials are terminated and the best config of the last complete
+round wins.
+"""
+import logging
+import math
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterSampler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPACE = {
+    "n_estimators": [100, 200, 400],
+    "max_depth": [None, 12, 20],
+    "min_samples_leaf": [1, 2, 5],
+    "max_features": ["sqrt", 0.5],
+    "class_weight": [None, "balanced"]
+}
+
+# Applied to every trial, and to the final model
+BASE_PARAMS = {"random_state": 42}
+
+
+@dataclass
+class Trial:
+    params: dict
+    round: int
+    n_samples: int
+    score: float = float("nan")
+    fit_seconds: float = float("nan")
+
+
+# Training/validation arrays of a pool worker, set once by _init_worker
+_worker_data = {}
+
+
+def _init_worker(X, y, X_val, y_val):
+    _worker_data.update(X=X, y=y, X_val=X_val, y_val=y_val)
+
+
+def _run_trial(params, n_samples, n_jobs):
+    """(validation ROC AUC, fit seconds) of one config on the first n_samples rows"""
+    started = time.perf_counter()
+    model = RandomForestClassifier(**BASE_PARAMS, **params, n_jobs=n_jobs)
+    model.fit(_worker_data["X"][:n_samples], _worker_data["y"][:n_samples])
+    fit_seconds = time.perf_counter() - started
+    proba = model.predict_proba(_worker_data["X_val"])[:, 1]
+    return roc_auc_score(_worker_data["y_val"], proba), fit_seconds
+
+
+def successive_halving(X, y, X_val, y_val, space=DEFAULT_SPACE, n_candidates=18, factor=3,
+                       min_samples=2000, n_cores=None, time_budget=None, random_state=42):
+    """Search space on (X, y) scored on (X_val, y_val); returns (best_params, trials).
+
+    best_params is None when not even one trial finished within time_budget
+    (seconds). trials lists every finished trial of every round.
+    """
+    n_cores = n_cores or os.cpu_count() or 1
+    deadline = time.monotonic() + time_budget if time_budget else None
+
+    grid_size = math.prod(len(values) for values in space.values())
+    candidates = list(ParameterSampler(space, n_iter=min(n_candidates, grid_size), random_state=random_state))
+    # Rows in random order, so every subsample is a random one (and nested in the next)
+    order = np.random.default_rng(random_state).permutation(len(X))
+    X, y = np.asarray(X)[order], np.asarray(y)[order]
+    n_rounds = max(1, math.ceil(math.log(len(candidates), factor)))
+
+    trials = []
+    best = None
+    pool = multiprocessing.get_context().Pool(
+        processes=min(n_cores, len(candidates)),
+        initializer=_init_worker,
+        initargs=(X, y, X_val, y_val)
+    )
+    try:
+        for round_index in range(n_rounds):
+            n_samples = min(len(X), max(min_samples, len(X) // factor ** (n_rounds - 1 - round_index)))
+            n_jobs = max(1, n_cores // len(candidates))
+            logger.info(f"Round {round_index}: {len(candidates)} candidates on {n_samples} rows, "
+                        f"n_jobs={n_jobs}")
+            pending = [
+                (Trial(params, round_index, n_samples), pool.apply_async(_run_trial, (params, n_samples, n_jobs)))
+                for params in candidates
+            ]
+            finished = []
+            for trial, result in pending:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    trial.score, trial.fit_seconds = result.get(timeout)
+                except multiprocessing.TimeoutError:
+                    break
+                finished.append(trial)
+            trials.extend(finished)
+            finished.sort(key=lambda trial: trial.score, reverse=True)
+
+            if len(finished) < len(pending):
+                logger.warning(f"Search time budget reached in round {round_index} "
+                               f"({len(finished)}/{len(pending)} trials finished)")
+                if best is None and finished:
+                    best = finished[0]
+                break
+            best = finished[0]
+            candidates = [trial.params for trial in finished[:math.ceil(len(finished) / factor)]]
+    finally:
+        pool.terminate()
+        pool.join()
+
+    if best is None:
+        return None, trials
+    logger.info(f"Best params {best.params}: ROC AUC {best.score:.4f} on {best.n_samples} rows")
+    return best.params, trials
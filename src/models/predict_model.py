@@ -3,6 +3,7 @@ import joblib
 import pandas as pd
 import sys
 import json
+from src.models.dataset_io import read_preprocessed
 
 # Load your saved model
 loaded_model = joblib.load("./src/models/trained_model.joblib")
@@ -26,7 +27,7 @@ if __name__ == "__main__":
         with open(json_file, 'r') as file:
             features = json.load(file)
     else:
-        X_train = pd.read_csv("data/preprocessed/X_train.csv")
+        X_train = read_preprocessed("X_train")
         feature_names = X_train.columns.tolist()
         features = get_feature_values_manually(feature_names)
 
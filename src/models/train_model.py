@@ -1,4 +1,3 @@
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score
@@ -9,13 +8,38 @@ from pathlib import Path
 import logging
 import sys
 import shutil
+import time
+import math
+from datetime import datetime, timezone
 from sklearn.model_selection import train_test_split
 from mlflow.models import infer_signature
 from mlflow.tracking import MlflowClient
-
+from src.models.forest_engine import export_flat_forest
+from src.models.dataset_io import PROD_MODEL_PATH, read_partitions, read_preprocessed, write_prod_stamp
+from src.models.param_search import BASE_PARAMS, successive_halving
+from src.utils.profiling import start_run, stage
 
 logger = logging.getLogger(__name__)
 
+# Hyperparameter search before the final fit (see param_search.py). Off by
+# default: it adds up to TRAIN_SEARCH_BUDGET_S to every dvc repro and every
+# /retrain run, so it is opted into (TRAIN_SEARCH=true) when worth it
+SEARCH_ENABLED = os.getenv("TRAIN_SEARCH", "false").lower() in ("1", "true", "yes")
+SEARCH_TIME_BUDGET = float(os.getenv("TRAIN_SEARCH_BUDGET_S", "600"))
+SEARCH_CANDIDATES = int(os.getenv("TRAIN_SEARCH_CANDIDATES", "18"))
+# Cores shared by the search workers, and used by the final fit
+CPU_BUDGET = int(os.getenv("TRAIN_CPU_BUDGET", str(os.cpu_count() or 1)))
+# Config used without search, or when the search finished no trial in time
+DEFAULT_PARAMS = {"n_estimators": 100}
+
+# "full" refits every tree; "incremental" grows trees on the years the prod
+# model has not seen yet (falls back to full when it can't)
+TRAIN_MODE = os.getenv("TRAIN_MODE", "full").lower()
+# Trees added per incremental run; 0 = in proportion to the share of new rows
+INCREMENTAL_TREES = int(os.getenv("TRAIN_INCREMENTAL_TREES", "0"))
+# Oldest trees are retired beyond this many; 0 = keep them all
+MAX_TREES = int(os.getenv("TRAIN_MAX_TREES", "0"))
+
 def setup_logging():
     logging.basicConfig(
         level=logging.INFO,
@@ -26,27 +50,151 @@ def setup_logging():
         ]
     )
 
-def save_model_locally(model, path):
-    """Сохраняем модель в файл .joblib"""
+def save_model_locally(model, path, flat_path=None, X_check=None):
+    """Сохраняем модель в файл .joblib
+
+    With flat_path, the forest is also exported as a FlatForest .npy bundle,
+    which the API can memory-map and share between uvicorn workers. A failed
+    export (e.g. a parity check divergence) raises, and leaves no bundle
+    behind for evaluate_model to promote.
+    """
+    if flat_path is not None:
+        # A bundle from a previous run must never be promoted with this model
+        shutil.rmtree(flat_path, ignore_errors=True)
     try:
         path.parent.mkdir(parents=True, exist_ok=True)
         joblib.dump(model, path)
         logger.info(f"Model saved local: {path}")
-        return True
     except Exception as e:
         logger.error(f"Model save error: {e}")
         return False
+    if flat_path is not None:
+        export_flat_forest(model, flat_path, X_check=X_check)
+    return True
+
+def search_params(X_train, y_train):
+    """Best forest params by successive halving on a validation split of the training set"""
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=0.2, random_state=42, stratify=y_train
+    )
+    started = time.perf_counter()
+    best_params, trials = successive_halving(
+        X_fit.to_numpy(dtype=np.float32), y_fit,
+        X_val.to_numpy(dtype=np.float32), y_val,
+        n_candidates=SEARCH_CANDIDATES,
+        n_cores=CPU_BUDGET,
+        time_budget=SEARCH_TIME_BUDGET
+    )
+    logger.info(f"Search: {len(trials)} trials in {time.perf_counter() - started:.1f}s")
+    if best_params is None:
+        logger.warning(f"No search trial finished in {SEARCH_TIME_BUDGET}s, using {DEFAULT_PARAMS}")
+        return dict(DEFAULT_PARAMS), trials
+    return best_params, trials
+
+def log_trials(trials):
+    """One nested MLflow run per search trial"""
+    for i, trial in enumerate(trials):
+        with mlflow.start_run(run_name=f"trial-{trial.round}-{i}", nested=True):
+            mlflow.log_params(trial.params)
+            mlflow.log_metrics({
+                "val_roc_auc": trial.score,
+                "fit_seconds": trial.fit_seconds,
+                "n_samples": trial.n_samples,
+                "round": trial.round
+            })
+
+def lineage_entry(partitions, n_rows):
+    """What one batch of trees was trained on: {year: partition key}, row count, time"""
+    return {
+        "partitions": dict(partitions),
+        "rows": int(n_rows),
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds")
+    }
+
+def set_tree_lineage(model, entry, first_tree=0):
+    """Record entry as the lineage of model.estimators_[first_tree:]"""
+    lineage = list(getattr(model, "tree_lineage_", []))[:first_tree]
+    model.tree_lineage_ = lineage + [entry] * (len(model.estimators_) - first_tree)
 
-def log_to_mlflow(model, X_test, y_test, run):
+def seen_partitions(model):
+    """{year: partition key} of the data the model's trees were trained on (newest wins)"""
+    seen = {}
+    for entry in getattr(model, "tree_lineage_", []):
+        seen.update(entry["partitions"])
+    return seen
+
+def retire_oldest_trees(model, max_trees):
+    """Drop the oldest trees beyond max_trees; returns how many were dropped"""
+    n_retired = max(0, len(model.estimators_) - max_trees) if max_trees else 0
+    if n_retired:
+        model.estimators_ = model.estimators_[n_retired:]
+        model.tree_lineage_ = model.tree_lineage_[n_retired:]
+        model.set_params(n_estimators=len(model.estimators_))
+    return n_retired
+
+def load_incremental_base(X_train, partitions):
+    """The prod model if it can be grown on X_train, else None"""
+    if not partitions:
+        logger.info("Incremental training: no partitions.json, full retrain")
+        return None
+    if not os.path.exists(PROD_MODEL_PATH):
+        logger.info(f"Incremental training: no {PROD_MODEL_PATH}, full retrain")
+        return None
+    model = joblib.load(PROD_MODEL_PATH)
+    if not isinstance(model, RandomForestClassifier) or not hasattr(model, "tree_lineage_"):
+        logger.info("Incremental training: prod model has no tree lineage, full retrain")
+        return None
+    if list(getattr(model, "feature_names_in_", [])) != list(X_train.columns):
+        logger.info("Incremental training: features changed, full retrain")
+        return None
+    return model
+
+def incremental_fit(model, X_train, y_train, partitions):
+    """Grow model with warm_start on the rows of new or changed years only.
+
+    Returns the model and a dict of what was done, for MLflow. The model is
+    None when the new rows can't be grown on (they miss one of the classes,
+    which a warm_start fit would drop from classes_): retrain fully then.
+    """
+    seen = seen_partitions(model)
+    new_years = sorted(year for year, key in partitions.items() if seen.get(year) != key)
+    info = {"train_mode": "incremental", "new_years": ",".join(new_years), "new_rows": 0,
+            "new_trees": 0, "retired_trees": 0}
+    if not new_years:
+        logger.info("Incremental training: no new data, keeping the prod model's trees")
+        return model, info
+
+    new_rows = X_train["year_acc"].astype(int).astype(str).isin(new_years).to_numpy()
+    missing = set(model.classes_) - set(np.unique(y_train[new_rows]))
+    if missing:
+        logger.info(f"Incremental training: no rows of class {sorted(missing)} in {new_years}, full retrain")
+        return None, info
+    n_trees = len(model.estimators_)
+    n_new = INCREMENTAL_TREES or max(1, math.ceil(n_trees * new_rows.mean()))
+    logger.info(f"Incremental training: {n_new} trees on {new_rows.sum()} rows of {new_years}")
+
+    model.set_params(warm_start=True, n_estimators=n_trees + n_new, n_jobs=CPU_BUDGET)
+    model.fit(X_train[new_rows], y_train[new_rows])
+    model.set_params(warm_start=False, n_jobs=None)
+    set_tree_lineage(model, lineage_entry({year: partitions[year] for year in new_years}, new_rows.sum()),
+                     first_tree=n_trees)
+    info.update(new_rows=int(new_rows.sum()), new_trees=n_new,
+                retired_trees=retire_oldest_trees(model, MAX_TREES))
+    return model, info
+
+def log_to_mlflow(model, X_test, y_test, run, trials=(), train_info=None):
     logger.info("\nStart logging in MLFLOW")
 
     accuracy = accuracy_score(y_test, model.predict(X_test))
-    mlflow.log_params({
-        "n_estimators": 100,
-        "random_state": 42,
-        "model_type": "RandomForestClassifier"
-    })
+    # The fitted model's own params, whichever config was picked
+    mlflow.log_params({**model.get_params(), "model_type": type(model).__name__})
     mlflow.log_metric("accuracy", accuracy)
+    if train_info:
+        mlflow.log_params(train_info)
+    mlflow.log_dict({"trees": getattr(model, "tree_lineage_", [])}, "tree_lineage.json")
+    if trials:
+        mlflow.log_metric("search_trials", len(trials))
+        log_trials(trials)
 
     signature = infer_signature(X_test, model.predict(X_test))
 
@@ -57,45 +205,82 @@ def log_to_mlflow(model, X_test, y_test, run):
     if model_path.exists():
         shutil.rmtree(model_path)
 
-    mlflow.sklearn.save_model(model, model_path, signature=signature)
-    mlflow.log_artifacts(model_path, artifact_path="model")
+    with stage("artifacts"):
+        mlflow.sklearn.save_model(model, model_path, signature=signature)
+        mlflow.log_artifacts(model_path, artifact_path="model")
 
-    model_uri = f"runs:/{run.info.run_id}/model"
-    result = mlflow.register_model(model_uri, "Accidents_RF_Model")
+    with stage("register"):
+        model_uri = f"runs:/{run.info.run_id}/model"
+        result = mlflow.register_model(model_uri, "Accidents_RF_Model")
 
-    client = MlflowClient()
+        client = MlflowClient()
 
-    client.update_registered_model(
-        name="Accidents_RF_Model",
-        description="Model Random Forest"
-    )
+        client.update_registered_model(
+            name="Accidents_RF_Model",
+            description="Model Random Forest"
+        )
 
-    # Теги
-    client.set_registered_model_tag("Accidents_RF_Model", "owner", "mlops-pipeline")
-    client.set_registered_model_tag("Accidents_RF_Model", "type", "baseline")
+        # Теги
+        client.set_registered_model_tag("Accidents_RF_Model", "owner", "mlops-pipeline")
+        client.set_registered_model_tag("Accidents_RF_Model", "type", "baseline")
 
 
 def retrain():
     setup_logging()
     logger.info("Start training")
+    profiler = start_run("train")
+
+    with stage("read") as record:
+        X_train = read_preprocessed('X_train')
+        X_test = read_preprocessed('X_test')
+        y_train = read_preprocessed('y_train')
+        y_test = read_preprocessed('y_test')
+        y_train = np.ravel(y_train)
+        y_test = np.ravel(y_test)
+        record["rows"] = len(X_train) + len(X_test)
 
-    X_train = pd.read_csv('data/preprocessed/X_train.csv')
-    X_test = pd.read_csv('data/preprocessed/X_test.csv')
-    y_train = pd.read_csv('data/preprocessed/y_train.csv')
-    y_test = pd.read_csv('data/preprocessed/y_test.csv')
-    y_train = np.ravel(y_train)
-    y_test = np.ravel(y_test)
+    partitions = read_partitions()
+    # What DVC sees of the prod model this run could grow on
+    write_prod_stamp()
 
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    with stage("load_base"):
+        model = load_incremental_base(X_train, partitions) if TRAIN_MODE == "incremental" else None
+    trials = []
+    if model is not None:
+        with stage("incremental_fit", rows=len(X_train)):
+            model, train_info = incremental_fit(model, X_train, y_train, partitions)
+    if model is None:
+        with stage("search"):
+            params, trials = search_params(X_train, y_train) if SEARCH_ENABLED else (dict(DEFAULT_PARAMS), [])
+        with stage("fit", rows=len(X_train)):
+            model = RandomForestClassifier(**BASE_PARAMS, **params, n_jobs=CPU_BUDGET)
+            model.fit(X_train, y_train)
+        # Serving predicts one row at a time: no thread pool per call
+        model.set_params(n_jobs=None)
+        set_tree_lineage(model, lineage_entry(partitions, len(X_train)))
+        train_info = {"train_mode": "full"}
+    # Lets evaluate_model pick the promotion gate for how the model was trained
+    model.train_info_ = train_info
 
-    save_model_locally(model, Path("src/models/trained_model.joblib"))
+    with stage("save"):
+        saved = save_model_locally(
+            model,
+            Path("src/models/trained_model.joblib"),
+            flat_path=Path("src/models/trained_model_flat"),
+            X_check=X_test.head(1000)
+        )
+    if not saved:
+        raise RuntimeError("Trained model could not be saved, not logging it")
 
     mlflow.set_tracking_uri("http://mlflow:5000")
     mlflow.set_experiment("Accidents_Prediction")
 
     with mlflow.start_run() as run:
-        log_to_mlflow(model, X_test, y_test, run)
+        with stage("log"):
+            log_to_mlflow(model, X_test, y_test, run, trials, train_info)
+        # Timings of this run, next to its params and metrics
+        profiler.finish().log_to_mlflow()
+    profiler.write()
 
 if __name__ == "__main__":
     retrain()
\ No newline at end of file
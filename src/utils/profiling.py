@@ -0,0 +1,182 @@
+"""Per-stage timing of pipeline runs: wall time, peak RSS and row counts.
+
+A script starts a run, and library code marks its steps with the stage()
+context manager, a no-op when no run is active, so instrumented functions
+cost nothing when called elsewhere (API, benchmarks). Stages nest, and are
+named by their path ("year_2021/read").
+
+    profiler = start_run("preprocess")
+    with stage("read") as record:
+        df = pd.read_csv(...)
+        record["rows"] = len(df)
+    profiler.finish()
+    profiler.write("reports/profiling/preprocess.json")
+
+Peak RSS is sampled by a background thread, so each stage reports the
+largest resident size seen while it ran (to the sampling interval).
+"""
+import json
+import logging
+import os
+import re
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PIPELINE_PROFILE_DIR", "reports/profiling")
+
+# Profiler of the current run, if any
+_active = None
+
+
+def _rss_bytes():
+    """Current resident set size (peak so far where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kB on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageProfiler:
+    """Stages of one pipeline run, in start order.
+
+    Entering a stage that already ran (a loop body, a function called
+    again) adds to its record: seconds and rows are summed over the
+    calls, peak_rss_mb is the highest of them.
+    """
+
+    def __init__(self, name, sample_interval=0.05):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.total_seconds = None
+        self._records = {}
+        self._started = time.perf_counter()
+        # Stages being run, each with the peak RSS seen since it was entered;
+        # shared with the sampler thread, under _lock
+        self._open = []
+        self._lock = threading.Lock()
+        self._peak_rss = _rss_bytes()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, args=(sample_interval,),
+                                         name=f"profiler-{name}", daemon=True)
+        self._sampler.start()
+
+    def _sample(self, interval):
+        while not self._stop.wait(interval):
+            self._observe(_rss_bytes())
+
+    def _observe(self, rss):
+        with self._lock:
+            self._peak_rss = max(self._peak_rss, rss)
+            for entry in self._open:
+                entry["peak"] = max(entry["peak"], rss)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time the enclosed block; rows can also be set on the yielded dict"""
+        with self._lock:
+            path = "/".join([entry["record"]["name"] for entry in self._open] + [name])
+            record = self._records.setdefault(path, {"name": path, "calls": 0, "seconds": 0.0, "rows": None,
+                                                     "peak_rss_mb": 0.0})
+            entry = {"record": record, "peak": _rss_bytes()}
+            self._open.append(entry)
+        call = {"rows": rows}
+        started = time.perf_counter()
+        try:
+            yield call
+        finally:
+            record["seconds"] += time.perf_counter() - started
+            record["calls"] += 1
+            if call["rows"] is not None:
+                record["rows"] = (record["rows"] or 0) + int(call["rows"])
+            self._observe(_rss_bytes())
+            with self._lock:
+                self._open.remove(entry)
+            record["peak_rss_mb"] = max(record["peak_rss_mb"], entry["peak"] / 2**20)
+
+    def finish(self):
+        """Stop sampling and fix the run's total time"""
+        if self.total_seconds is None:
+            self._stop.set()
+            self._sampler.join()
+            self._observe(_rss_bytes())
+            self.total_seconds = time.perf_counter() - self._started
+        return self
+
+    def report(self):
+        return {
+            "run": self.name,
+            "started_at": self.started_at,
+            "total_seconds": self.total_seconds,
+            "peak_rss_mb": self._peak_rss / 2**20,
+            "stages": [dict(record) for record in self._records.values()]
+        }
+
+    def write(self, path=None):
+        """Write the JSON report (default: PROFILE_DIR/<run name>.json)"""
+        path = path or os.path.join(PROFILE_DIR, f"{self.name}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info(f"Profile of {self.name} written to {path}")
+        return path
+
+    def metrics(self):
+        """Key numbers as MLflow metrics: total, peak RSS, and time/rows of every stage"""
+        metrics = {
+            "profile_total_seconds": self.total_seconds,
+            "profile_peak_rss_mb": self._peak_rss / 2**20
+        }
+        for record in self._records.values():
+            # MLflow metric names can't hold '=' and a few other characters
+            key = "profile/" + re.sub(r"[^\w./ -]", "_", record["name"])
+            metrics[f"{key}/seconds"] = record["seconds"]
+            if record["rows"] is not None:
+                metrics[f"{key}/rows"] = record["rows"]
+        return metrics
+
+    def log_to_mlflow(self, experiment=None):
+        """Log metrics() to the active MLflow run, or to a new run named after this one
+        (in experiment, if given).
+
+        Never raises: profiling must not fail the pipeline.
+        """
+        try:
+            import mlflow
+
+            if mlflow.active_run() is not None:
+                mlflow.log_metrics(self.metrics())
+            else:
+                if experiment:
+                    mlflow.set_experiment(experiment)
+                with mlflow.start_run(run_name=self.name):
+                    mlflow.log_metrics(self.metrics())
+        except Exception as e:
+            logger.warning(f"Could not log the {self.name} profile to MLflow: {e}")
+
+
+def start_run(name, **kwargs):
+    """Start profiling a run; stage() records into it until it is finished"""
+    global _active
+    if _active is not None:
+        _active.finish()
+    _active = StageProfiler(name, **kwargs)
+    return _active
+
+
+@contextmanager
+def stage(name, rows=None):
+    """StageProfiler.stage on the active run; yields a throwaway dict without one"""
+    if _active is None or _active.total_seconds is not None:
+        yield {}
+        return
+    with _active.stage(name, rows) as record:
+        yield record